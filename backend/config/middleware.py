@@ -0,0 +1,54 @@
+import os
+import re
+from urllib.parse import urlparse
+
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
+from whitenoise.string_utils import ensure_leading_trailing_slash
+
+# store.images derivative names carry a content hash: <stem>.<hash>.<size>.<format>
+HASHED_MEDIA_RE = re.compile(r"\.[0-9a-f]{12}\.\w+\.(webp|avif)$")
+
+
+class MediaWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise for static files and MEDIA_ROOT uploads.
+
+    Static files are indexed at startup as usual. Media is written at runtime,
+    so media URLs are resolved on disk per request; content-hashed derivatives
+    are then remembered and served with a far-future immutable Cache-Control.
+    """
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.media_prefix = ensure_leading_trailing_slash(urlparse(settings.MEDIA_URL or "").path)
+        self.media_root = os.path.abspath(settings.MEDIA_ROOT).rstrip(os.path.sep) + os.path.sep
+
+    def __call__(self, request):
+        url = request.path_info
+        if url.startswith(self.media_prefix):
+            media_file = self.files.get(url) or self.find_media_file(url)
+            if media_file is not None:
+                return self.serve(media_file, request)
+            return self.get_response(request)
+        return super().__call__(request)
+
+    def find_media_file(self, url):
+        if not self.url_is_canonical(url):
+            return None
+        path = os.path.join(self.media_root, url[len(self.media_prefix):])
+        if not self.path_is_child_of(path, self.media_root) or not os.path.isfile(path):
+            return None
+        try:
+            media_file = self.get_static_file(path, url)
+        except MissingFileError:
+            return None
+        if HASHED_MEDIA_RE.search(url):
+            self.files[url] = media_file  # Immutable, safe to keep
+        return media_file
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.media_prefix):
+            return bool(HASHED_MEDIA_RE.search(url))
+        return super().immutable_file_test(path, url)
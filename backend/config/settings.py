@@ -33,7 +33,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', # Add WhiteNoise for static files
+    'config.middleware.MediaWhiteNoiseMiddleware', # WhiteNoise for static files and media
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,13 +63,19 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database
 # Use SQLite locally, but Postgres on Railway (via DATABASE_URL)
+# Served over ASGI (see Procfile): persistent connections are not reused
+# across async requests and would pile up, so each request closes its own.
+# Connection pooling (OPTIONS={'pool': ...}) needs psycopg 3, not psycopg2.
 DATABASES = {
     'default': dj_database_url.config(
         default=f'sqlite:///{BASE_DIR / "db.sqlite3"}',
-        conn_max_age=600
+        conn_max_age=0
     )
 }
 
+# Covering-index INCLUDE columns only apply on Postgres; SQLite builds the plain index
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
 # Explicitly prevent ephemeral SQLite usage in production
 if not DEBUG and 'sqlite' in DATABASES['default'].get('ENGINE', ''):
     raise ValueError(
@@ -77,6 +83,20 @@ if not DEBUG and 'sqlite' in DATABASES['default'].get('ENGINE', ''):
         "Ephemeral SQLite is not allowed since it will be wiped on Railway redeploys."
     )
 
+# Cache (catalog, receipts): per-process memory by default. Set REDIS_URL to
+# share it across workers so invalidations reach every process (needs `redis`).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
+# Analytics backend: 'rollup' aggregates HourlySales in the database, 'columnar'
+# keeps an in-memory NumPy snapshot of receipts per worker (see store.engine)
+ANALYTICS_ENGINE = os.environ.get('ANALYTICS_ENGINE', 'rollup')
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -16,12 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from django.conf import settings
-from django.conf.urls.static import static
 from .api import api
 
+# Media is served by config.middleware.MediaWhiteNoiseMiddleware
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', api.urls),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
 
@@ -1,12 +1,21 @@
 from ninja import Router, Schema
 from typing import List
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse
+from django.http import FileResponse, Http404, StreamingHttpResponse, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Prefetch
 from store.models import Order, OrderItem, Product, Receipt, ReceiptItem
+from store.rollups import refresh_sales_rollup_on_commit
 from .models import Payment
-from .utils.aba_payway import generate_qr, check_transaction
+from asgiref.sync import sync_to_async
+from .utils.aba_payway import agenerate_qr, verify_pushback
 from .utils.receipt import generate_order_receipt_pdf
+from .utils.escpos import generate_order_receipt_escpos
 import uuid
+import json
+import base64
+import asyncio
 
 router = Router()
 
@@ -24,51 +33,62 @@ class CheckoutResponse(Schema):
     qr_data: dict # Contains qr_image url etc
     total_amount: int
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
-from .utils.mock_qr import generate_mock_khqr_base64
+from .utils.mock_qr import render_mock_khqr_png
 
-@router.post("/checkout", response=CheckoutResponse)
-def checkout(request, payload: CheckoutRequest):
-    # 1. Create Order
-    # Unique order number
-    order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-    
-    order = Order.objects.create(
-        order_number=order_number,
-        status='PENDING',
-        total_amount=0 # Will update
-    )
-    
-    calculated_total = 0
-    items_for_aba = []
-    
-    for item in payload.items:
-        product = get_object_or_404(Product, id=item.product_id)
-        line_total = product.price * item.quantity
-        calculated_total += line_total
-        
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            quantity=item.quantity,
-            price_at_time=product.price
+QR_DATA_URI_PREFIX = "data:image/png;base64,"
+
+def decode_png_data_uri(value):
+    if isinstance(value, str) and value.startswith(QR_DATA_URI_PREFIX):
+        return base64.b64decode(value[len(QR_DATA_URI_PREFIX):])
+    return None
+
+def create_pending_order(items: List[CartItemSchema]) -> Order:
+    """
+    Creates a PENDING Order and its OrderItems using a fixed number of queries:
+    one bulk product lookup, one Order insert and one OrderItem bulk insert,
+    all inside a single transaction.
+    """
+    product_ids = {item.product_id for item in items}
+    products = Product.objects.in_bulk(product_ids)
+    if len(products) != len(product_ids):
+        raise Http404("No Product matches the given query.")
+
+    calculated_total = sum(products[item.product_id].price * item.quantity for item in items)
+
+    with transaction.atomic():
+        # Unique order number
+        order = Order.objects.create(
+            order_number=f"ORD-{uuid.uuid4().hex[:8].upper()}",
+            status='PENDING',
+            total_amount=calculated_total
         )
-        
-        items_for_aba.append({
-            "name": product.name,
-            "quantity": item.quantity,
-            "price": str(product.price / 100.0) 
-        })
-        
-    order.total_amount = calculated_total
-    order.save()
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=products[item.product_id],
+                quantity=item.quantity,
+                price_at_time=products[item.product_id].price
+            )
+            for item in items
+        ])
+
+    return order
+
+@router.post("/checkout", response=CheckoutResponse)
+async def checkout(request, payload: CheckoutRequest):
+    # 1. Create Order (committed before the gateway is contacted)
+    order = await sync_to_async(create_pending_order)(payload.items)
+    calculated_total = order.total_amount
     
     # 2. Call ABA Generate QR
     tran_id = f"TRX-{order.order_number}"
     amount_usd = calculated_total / 100.0
     
+    qr_image = None
     try:
-        qr_response = generate_qr(
+        qr_response = await agenerate_qr(
             amount=amount_usd,
             currency="USD",
             payment_option="abapay_khqr",
@@ -78,23 +98,29 @@ def checkout(request, payload: CheckoutRequest):
         if settings.DEBUG:
             print("WARNING: ABA PayWay API failed. Using beautiful mock Rabbit Cafe KHQR for local dev.")
             
-            # Generate the dynamic base64 KHQR image matching the requested style
-            b64_img = generate_mock_khqr_base64(amount_usd, shop_name="Rabbit Cafe")
+            # Generate the dynamic KHQR image matching the requested style
+            qr_image = await sync_to_async(render_mock_khqr_png)(round(amount_usd, 2), shop_name="Rabbit Cafe")
             
             qr_response = {
-                "hash": "mock_hash_123",
-                "qrImage": b64_img
+                "hash": "mock_hash_123"
             }
         else:
             raise e
     
+    # The image is served by /orders/{id}/qr.png; the JSON only carries its URL
+    if qr_image is None:
+        qr_image = decode_png_data_uri(qr_response.get('qrImage'))
+    if qr_image is not None:
+        qr_response["qrImage"] = reverse(f"{router.api.urls_namespace}:order_qr_png", kwargs={"order_id": order.id})
+    
     # 3. Create Payment Record
-    Payment.objects.create(
+    await Payment.objects.acreate(
         order=order,
         transaction_id=tran_id,
         amount=calculated_total,
         status='PENDING',
-        payload_hash=qr_response.get('hash', '')
+        payload_hash=qr_response.get('hash', ''),
+        qr_image=qr_image
     )
     
     return {
@@ -112,76 +138,266 @@ class OrderStatusResponse(Schema):
 class SuccessResponse(Schema):
     success: bool
 
-def sync_order_to_receipt(order: Order):
-    if Receipt.objects.filter(receipt_id=order.order_number).exists():
-        return
-        
-    receipt = Receipt.objects.create(
-        receipt_id=order.order_number,
-        total_items=sum(item.quantity for item in order.items.all()),
-        total_amount=order.total_amount / 100.0,
-        source='REAL'
-    )
-    
-    for item in order.items.all():
-        ReceiptItem.objects.create(
+def _receipt_fields(order: Order, items) -> dict:
+    return {
+        "total_items": sum(item.quantity for item in items),
+        "total_amount": order.total_amount,
+        "source": 'REAL',
+    }
+
+def _receipt_items(receipt: Receipt, items) -> List[ReceiptItem]:
+    return [
+        ReceiptItem(
             receipt=receipt,
             product=item.product,
+            created_at=receipt.created_at,
+            category=item.product.category if item.product else None,
             product_name_snapshot=item.product.name if item.product else "Unknown Product",
             category_snapshot=item.product.category.name if item.product and item.product.category else "Unknown",
             qty=item.quantity,
-            unit_price=item.price_at_time / 100.0,
-            line_total=item.line_total / 100.0
+            unit_price=item.price_at_time,
+            line_total=item.line_total
+        )
+        for item in items
+    ]
+
+def sync_order_to_receipt(order: Order):
+    """
+    Writes the Receipt for a paid order: one item fetch (product and category
+    joined in), one get_or_create on the unique receipt_id and one bulk insert
+    of the lines. A concurrent confirmation of the same order loses the
+    get_or_create race and returns without inserting anything.
+    """
+    items = list(OrderItem.objects.filter(order=order).select_related('product__category'))
+
+    with transaction.atomic():
+        receipt, created = Receipt.objects.get_or_create(
+            receipt_id=order.order_number,
+            defaults=_receipt_fields(order, items)
         )
+        if created:
+            ReceiptItem.objects.bulk_create(_receipt_items(receipt, items))
+            refresh_sales_rollup_on_commit(receipt.created_at)
+    return receipt
+
+def sync_orders_to_receipts(orders, batch_size: int = 500) -> int:
+    """
+    Bulk variant of sync_order_to_receipt for back-filling many orders.
+    Orders that already have a Receipt are skipped. Each batch costs a fixed
+    number of queries regardless of its size. Returns the receipts created.
+    """
+    order_ids = list(
+        orders.exclude(order_number__in=Receipt.objects.values('receipt_id'))
+              .order_by('id')
+              .values_list('id', flat=True)
+    )
+    items_qs = OrderItem.objects.select_related('product__category')
+    created = 0
+
+    for i in range(0, len(order_ids), batch_size):
+        chunk = list(
+            Order.objects.filter(id__in=order_ids[i:i + batch_size])
+                 .prefetch_related(Prefetch('items', queryset=items_qs))
+        )
+        with transaction.atomic():
+            Receipt.objects.bulk_create(
+                # Stamped with the order's time, not now(): back-filled orders keep their hour and day
+                [Receipt(receipt_id=o.order_number, created_at=o.created_at, **_receipt_fields(o, o.items.all()))
+                 for o in chunk],
+                ignore_conflicts=True
+            )
+            receipts = Receipt.objects.in_bulk([o.order_number for o in chunk], field_name='receipt_id')
+            # Receipts that already had lines were written by a concurrent sync
+            filled = set(ReceiptItem.objects.filter(receipt__in=receipts.values()).values_list('receipt_id', flat=True).distinct())
+
+            lines = []
+            for o in chunk:
+                receipt = receipts.get(o.order_number)
+                if receipt and receipt.id not in filled:
+                    lines.extend(_receipt_items(receipt, o.items.all()))
+                    created += 1
+            ReceiptItem.objects.bulk_create(lines, batch_size=batch_size)
+
+            if receipts:
+                stamps = [r.created_at for r in receipts.values()]
+                refresh_sales_rollup_on_commit(min(stamps), max(stamps))
+
+    return created
+
+def confirm_order_payment(order: Order, payment: Payment = None):
+    """
+    Marks the payment COMPLETED, the order PAID and writes the Receipt.
+    """
+    with transaction.atomic():
+        if payment:
+            payment.status = 'COMPLETED'
+            payment.qr_image = None  # Paid: the QR is never shown again
+            payment.save()
+        order.status = 'PAID'
+        order.save()
+        sync_order_to_receipt(order)
+        signal_order_status([order.id])
+
+def order_status_queryset(order_id: int):
+    """
+    Order status plus the latest payment's status in one query.
+    """
+    latest_payment = Payment.objects.filter(order=OuterRef('pk')).order_by('-id')
+    return (Order.objects
+            .filter(id=order_id)
+            .annotate(
+                payment_status=Subquery(latest_payment.values('status')[:1]),
+            )
+            .values('id', 'status', 'payment_status'))
 
 @router.post("/orders/{order_id}/mock-pay", response=SuccessResponse)
 def mock_pay_order(request, order_id: int):
     val_order = get_object_or_404(Order, id=order_id)
     if settings.DEBUG and val_order.status == 'PENDING':
-        payment = val_order.payments.last()
-        if payment:
-            payment.status = 'COMPLETED'
-            payment.save()
-        val_order.status = 'PAID'
-        val_order.save()
-        sync_order_to_receipt(val_order)
+        confirm_order_payment(val_order, val_order.payments.last())
     return {"success": True}
 
 @router.get("/orders/{order_id}/status", response=OrderStatusResponse)
 def check_order_status(request, order_id: int):
-    val_order = get_object_or_404(Order, id=order_id)
-    
-    # Logic to poll ABA if pending
-    if val_order.status == 'PENDING':
-        payment = val_order.payments.last()
-        if payment and payment.status == 'PENDING':
-            # Check ABA
-             try:
-                res = check_transaction(payment.transaction_id)
-                code = res.get('status', {}).get('code')
-             except Exception as e:
-                 if not settings.DEBUG:
-                     print(f"Error checking ABA: {e}")
-                 code = "99" # Keep as pending unless ABA says otherwise or manual mock-pay is triggered
-                     
-             if code == "00":
-                 payment.status = 'COMPLETED'
-                 payment.save()
-                 val_order.status = 'PAID'
-                 val_order.save()
-                 sync_order_to_receipt(val_order)
-                 
+    # Pure database read: PayWay is checked by the reconcile_payments worker
+    snapshot = order_status_queryset(order_id).first()
+    if snapshot is None:
+        raise Http404("No Order matches the given query.")
+
     return {
-        "order_id": val_order.id,
-        "status": val_order.status,
-        "payment_status": val_order.payments.last().status if val_order.payments.exists() else 'NONE'
+        "order_id": snapshot['id'],
+        "status": snapshot['status'],
+        "payment_status": snapshot['payment_status'] or 'NONE'
     }
 
+@router.post("/payway/callback", response={200: SuccessResponse, 400: dict, 403: dict})
+def payway_callback(request):
+    """
+    PayWay pushback. Confirms the payment as soon as the gateway reports it,
+    without waiting for the reconciler. Safe to receive more than once.
+    """
+    from .reconciler import apply_paid_transactions
+
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        payload = request.POST.dict()
+    if not isinstance(payload, dict):
+        return 400, {"error": "Invalid payload"}
+
+    if not verify_pushback(payload):
+        return 403, {"error": "Invalid signature"}
+
+    tran_id = payload.get("tran_id")
+    if not tran_id:
+        return 400, {"error": "Missing tran_id"}
+
+    if str(payload.get("status")) in ("0", "00"):
+        apply_paid_transactions([tran_id])
+
+    return 200, {"success": True}
+
+# Server-Sent Events status stream. One long-lived connection per kiosk
+# replaces polling /status: the reconcile_payments worker talks to PayWay,
+# whoever pays an order sets a per-order cache key, and each stream polls
+# that key, reading the database only when it moves. The client only hears
+# about transitions.
+STATUS_STREAM_POLL_SECONDS = 1.0
+STATUS_STREAM_KEEPALIVE_SECONDS = 15.0
+STATUS_STREAM_MAX_SECONDS = 30 * 60  # Matches the PayWay QR lifetime
+# Database re-read for streams that missed the signal (per-process cache, evictions)
+STATUS_STREAM_DB_SECONDS = 15.0
+
+ORDER_STATUS_SIGNAL_KEY = "payments:order-status:{}"
+
+def signal_order_status(order_ids):
+    """Tells open status streams to re-read these orders once the transaction commits."""
+    token = uuid.uuid4().hex
+    keys = {ORDER_STATUS_SIGNAL_KEY.format(order_id): token for order_id in order_ids}
+    transaction.on_commit(lambda: cache.set_many(keys, STATUS_STREAM_MAX_SECONDS))
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/orders/{order_id}/events")
+async def stream_order_status(request, order_id: int):
+    # Read before the order, so a payment committing in between still moves it
+    signal_key = ORDER_STATUS_SIGNAL_KEY.format(order_id)
+    signal = await cache.aget(signal_key)
+    snapshot = await order_status_queryset(order_id).afirst()
+    if snapshot is None:
+        raise Http404("No Order matches the given query.")
+
+    async def events(current, seen):
+        loop = asyncio.get_running_loop()
+        started = last_sent = last_read = loop.time()
+        last_pushed = None
+
+        yield "retry: 3000\n\n"
+        while current is not None:
+            status = {
+                "order_id": current['id'],
+                "status": current['status'],
+                "payment_status": current['payment_status'] or 'NONE',
+            }
+            if status != last_pushed:
+                yield _sse_event("status", status)
+                last_pushed = status
+                last_sent = loop.time()
+
+            if current['status'] != 'PENDING' or loop.time() - started > STATUS_STREAM_MAX_SECONDS:
+                break
+
+            await asyncio.sleep(STATUS_STREAM_POLL_SECONDS)
+            now = loop.time()
+            if now - last_sent >= STATUS_STREAM_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = now
+
+            signal = await cache.aget(signal_key)
+            if signal != seen or now - last_read >= STATUS_STREAM_DB_SECONDS:
+                seen, last_read = signal, now
+                current = await order_status_queryset(order_id).afirst()
+
+    response = StreamingHttpResponse(events(snapshot, signal), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Stop proxies from buffering the stream
+    return response
+
+@router.get("/orders/{order_id}/qr.png", url_name="order_qr_png")
+def order_qr_png(request, order_id: int):
+    payment = (Payment.objects
+               .filter(order_id=order_id, qr_image__isnull=False)
+               .order_by('-id')
+               .values('transaction_id', 'qr_image')
+               .first())
+    if payment is None:
+        raise Http404("No QR image for this order.")
+
+    # A payment's QR never changes, so its transaction id is a stable ETag
+    etag = f'"{payment["transaction_id"]}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(bytes(payment['qr_image']), content_type="image/png")
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, max-age=1800, immutable"  # PayWay QR lifetime
+    return response
+
 @router.get("/orders/{order_id}/receipt")
-def download_receipt(request, order_id: int):
+def download_receipt(request, order_id: int, format: str = "pdf"):
+    if format == "escpos":
+        # Raw thermal-printer stream, for kiosks that print directly
+        data = generate_order_receipt_escpos(order_id)
+        if data is None:
+            raise Http404("No Order matches the given query.")
+        response = HttpResponse(data, content_type='application/octet-stream')
+        response["Content-Disposition"] = f'attachment; filename="receipt_order_{order_id}.bin"'
+        return response
+
     buffer = generate_order_receipt_pdf(order_id)
     if not buffer:
-        return {"error": "Order not found"}, 404
+        raise Http404("No Order matches the given query.")
     
     return FileResponse(
         buffer, 
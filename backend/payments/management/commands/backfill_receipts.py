@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from store.models import Order
+from payments.api import sync_orders_to_receipts
+
+
+class Command(BaseCommand):
+    help = 'Creates missing Receipts for paid Orders in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders per insert batch')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(status__in=['PAID', 'PREPARING', 'SERVED'])
+        created = sync_orders_to_receipts(orders, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Created {created} receipts."))
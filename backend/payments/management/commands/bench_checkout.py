@@ -0,0 +1,70 @@
+import time
+import statistics
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from store.models import Category, Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks /api/payments/checkout latency and query count as the cart grows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=str, default='1,5,10,25,50', help='Comma separated cart sizes (number of lines)')
+        parser.add_argument('--repeat', type=int, default=20, help='Checkouts per cart size')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s]
+        repeat = options['repeat']
+
+        # Everything runs inside one transaction that is rolled back at the end,
+        # so the benchmark never leaves orders or fixture products behind.
+        try:
+            with transaction.atomic():
+                self._run(sizes, repeat)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _run(self, sizes, repeat):
+        category = Category.objects.create(name='Bench', sort_order=999)
+        products = Product.objects.bulk_create([
+            Product(category=category, name=f'Bench Product {i}', price=100 + i)
+            for i in range(max(sizes))
+        ])
+        if not products[0].pk:
+            products = list(Product.objects.filter(category=category).order_by('id'))
+
+        client = Client()
+        # Isolate the database path from the PayWay gateway and the QR renderer.
+        fake_qr = {"hash": "bench", "qrImage": ""}
+
+        self.stdout.write(f"{'lines':>6} {'queries':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        with mock.patch('payments.api.agenerate_qr', new=mock.AsyncMock(return_value=fake_qr)):
+            for size in sizes:
+                body = {
+                    "items": [{"product_id": p.id, "quantity": 1} for p in products[:size]],
+                    "total_amount": 0,
+                }
+                timings = []
+                queries = 0
+                for _ in range(repeat):
+                    with CaptureQueriesContext(connection) as ctx:
+                        t0 = time.perf_counter()
+                        res = client.post('/api/payments/checkout', body, content_type='application/json')
+                        timings.append((time.perf_counter() - t0) * 1000)
+                    if res.status_code != 200:
+                        self.stdout.write(self.style.ERROR(f"Checkout failed with HTTP {res.status_code}: {res.content[:200]}"))
+                        return
+                    queries = len(ctx.captured_queries)
+
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(f"{size:>6} {queries:>8} {statistics.median(timings):>8.2f} {p95:>8.2f}")
@@ -0,0 +1,42 @@
+import time
+import statistics
+
+from django.core.management.base import BaseCommand
+from payments.utils import mock_qr
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark of mock KHQR rendering: cold (empty caches) vs warm (cached render).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='Renders per scenario')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        caches = (mock_qr._fonts, mock_qr._base_canvas, mock_qr._logo_badge, mock_qr.render_mock_khqr_png)
+
+        def cold():
+            for cache in caches:
+                cache.cache_clear()
+            mock_qr.generate_mock_khqr_base64(4.50)
+
+        def chrome_cached():
+            mock_qr.render_mock_khqr_png.cache_clear()
+            mock_qr.generate_mock_khqr_base64(4.50)
+
+        def warm():
+            mock_qr.generate_mock_khqr_base64(4.50)
+
+        self.stdout.write(f"{'scenario':<28} {'p50 ms':>8} {'mean ms':>8}")
+        for name, fn in (
+            ("cold (nothing cached)", cold),
+            ("new amount (chrome cached)", chrome_cached),
+            ("warm (render cached)", warm),
+        ):
+            fn()
+            timings = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                fn()
+                timings.append((time.perf_counter() - t0) * 1000)
+            self.stdout.write(f"{name:<28} {statistics.median(timings):>8.3f} {statistics.mean(timings):>8.3f}")
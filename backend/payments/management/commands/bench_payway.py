@@ -0,0 +1,112 @@
+import json
+import os
+import ssl
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+import urllib3
+from django.core.management.base import BaseCommand
+from payments.utils.aba_payway import PayWayClient, CHECK_TRANSACTION_PATH, build_check_txn_payload
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    """Stand-in PayWay endpoint: accepts any POST and answers like check-transaction."""
+    protocol_version = "HTTP/1.1"  # Required for keep-alive
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this Nagle's
+        # algorithm adds a delayed-ACK stall to every keep-alive response.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"status": {"code": "00", "message": "Success"}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks per-call requests.post against the pooled PayWayClient using a local stand-in gateway.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=200, help='Requests per client')
+        parser.add_argument('--no-tls', action='store_true', help='Serve plain HTTP instead of a self-signed HTTPS gateway')
+
+    def handle(self, *args, **options):
+        calls = options['calls']
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _GatewayHandler)
+        scheme = "http"
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            if not options['no_tls']:
+                if self._wrap_tls(server, tmpdir):
+                    scheme = "https"
+                else:
+                    self.stdout.write(self.style.WARNING("openssl not found, falling back to plain HTTP."))
+
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"{scheme}://127.0.0.1:{server.server_address[1]}"
+            url = f"{base_url}{CHECK_TRANSACTION_PATH}"
+            self.stdout.write(f"Stand-in gateway at {base_url}, {calls} calls per client")
+
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", urllib3.exceptions.InsecureRequestWarning)
+
+                def per_call():
+                    r = requests.post(url, json=build_check_txn_payload("TRX-BENCH"), timeout=(3.05, 30), verify=False)
+                    r.raise_for_status()
+
+                client = PayWayClient(base_url=base_url, verify=False)
+                pooled = lambda: client.check_transaction("TRX-BENCH")
+
+                cold = self._measure(per_call, calls)
+                warm = self._measure(pooled, calls)
+                client.close()
+        finally:
+            server.shutdown()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        self.stdout.write(f"{'client':<22} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, timings in (("requests.post", cold), ("PayWayClient (pooled)", warm)):
+            self.stdout.write(f"{name:<22} {statistics.mean(timings):>8.3f} {statistics.median(timings):>8.3f} {timings[int(len(timings) * 0.95)]:>8.3f}")
+        saved = statistics.mean(cold) - statistics.mean(warm)
+        self.stdout.write(self.style.SUCCESS(f"Connection reuse saves {saved:.3f} ms per gateway call."))
+
+    def _measure(self, fn, calls):
+        fn()  # Warm-up (the pooled client opens its connection here)
+        timings = []
+        for _ in range(calls):
+            t0 = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - t0) * 1000)
+        return sorted(timings)
+
+    def _wrap_tls(self, server, tmpdir):
+        if not shutil.which("openssl"):
+            return False
+        cert, key = os.path.join(tmpdir, "cert.pem"), os.path.join(tmpdir, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+            check=True, capture_output=True,
+        )
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(cert, key)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        return True
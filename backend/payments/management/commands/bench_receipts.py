@@ -0,0 +1,34 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from store.models import Order
+from payments.utils.receipt import generate_order_receipt_pdf
+
+
+class Command(BaseCommand):
+    help = 'Measures receipt PDFs generated per second on one core, uncached vs cached.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=50, help='Number of existing orders to render')
+        parser.add_argument('--rounds', type=int, default=3, help='Passes over the orders per scenario')
+
+    def handle(self, *args, **options):
+        order_ids = list(Order.objects.filter(items__isnull=False).distinct().order_by('-id').values_list('id', flat=True)[:options['orders']])
+        if not order_ids:
+            self.stdout.write(self.style.ERROR("No orders with items found. Run a few checkouts first."))
+            return
+
+        rounds = options['rounds']
+        cache.clear()
+        generate_order_receipt_pdf(order_ids[0], use_cache=False)  # Warm the logo and fonts
+
+        for name, use_cache in (("uncached render", False), ("cached download", True)):
+            size = 0
+            t0 = time.process_time()
+            for _ in range(rounds):
+                for order_id in order_ids:
+                    size = len(generate_order_receipt_pdf(order_id, use_cache=use_cache).getvalue())
+            elapsed = time.process_time() - t0
+            count = rounds * len(order_ids)
+            self.stdout.write(f"{name:<16} {count / elapsed:>9.1f} receipts/s/core  {elapsed / count * 1000:>7.2f} ms each  ({size} bytes)")
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from payments.reconciler import reconcile_pending_payments
+
+
+class Command(BaseCommand):
+    help = 'Checks PENDING payments against ABA PayWay and marks confirmed orders PAID.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running, one pass every --interval seconds')
+        parser.add_argument('--interval', type=float, default=3.0, help='Seconds between passes when looping')
+        parser.add_argument('--rate', type=float, default=5.0, help='Maximum PayWay calls per second')
+        parser.add_argument('--limit', type=int, default=None, help='Maximum transactions checked per pass')
+
+    def handle(self, *args, **options):
+        log = lambda msg: self.stdout.write(self.style.WARNING(msg))
+
+        while True:
+            close_old_connections()
+            checked, paid = reconcile_pending_payments(rate=options['rate'], limit=options['limit'], log=log)
+            if checked or not options['loop']:
+                self.stdout.write(f"Checked {checked} pending transactions, {paid} orders marked PAID.")
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
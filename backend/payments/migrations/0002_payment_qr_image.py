@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='qr_image',
+            field=models.BinaryField(blank=True, help_text='KHQR PNG served by /orders/{id}/qr.png', null=True),
+        ),
+    ]
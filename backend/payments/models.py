@@ -15,6 +15,7 @@ class Payment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     payload_hash = models.CharField(max_length=255, null=True, blank=True)
     aba_transaction_ref = models.CharField(max_length=255, null=True, blank=True)
+    qr_image = models.BinaryField(null=True, blank=True, help_text="KHQR PNG served by /orders/{id}/qr.png")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
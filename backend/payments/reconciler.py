@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from store.models import Order
+from .models import Payment
+from .utils.aba_payway import check_transaction
+
+# Only payments whose QR can still be paid are worth asking PayWay about
+PENDING_WINDOW = timedelta(minutes=35)  # 30 min QR lifetime + grace
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    def wait(self):
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+def pending_transaction_ids(window=PENDING_WINDOW, limit=None):
+    """
+    Distinct transaction ids of PENDING payments on PENDING orders, oldest first.
+    However many kiosks watch an order, its transaction is checked once per pass.
+    """
+    qs = (Payment.objects
+          .filter(status='PENDING', order__status='PENDING',
+                  transaction_id__isnull=False,
+                  created_at__gte=timezone.now() - window)
+          .order_by('created_at')
+          .values_list('transaction_id', flat=True)
+          .distinct())
+    if limit:
+        qs = qs[:limit]
+    return list(qs)
+
+def expire_qr_images(window=PENDING_WINDOW):
+    """
+    Drops the stored QR PNG of payments older than the window, whose QR can
+    no longer be paid. Returns how many were cleared.
+    """
+    return (Payment.objects
+            .filter(qr_image__isnull=False, created_at__lt=timezone.now() - window)
+            .update(qr_image=None))
+
+def apply_paid_transactions(transaction_ids):
+    """
+    Marks the given transactions COMPLETED and their orders PAID in one
+    transaction with set-based updates, then writes the receipts.
+    Returns the number of orders that transitioned to PAID.
+    """
+    from .api import signal_order_status, sync_orders_to_receipts
+
+    if not transaction_ids:
+        return 0
+
+    with transaction.atomic():
+        payments = Payment.objects.select_for_update().filter(transaction_id__in=transaction_ids, status='PENDING')
+        order_ids = list(payments.values_list('order_id', flat=True))
+        if not order_ids:
+            return 0
+
+        # A paid QR is never shown again, so its PNG goes too
+        Payment.objects.filter(transaction_id__in=transaction_ids, status='PENDING').update(status='COMPLETED', qr_image=None)
+        orders = Order.objects.filter(id__in=order_ids, status='PENDING')
+        paid_count = orders.update(status='PAID', updated_at=timezone.now())
+        sync_orders_to_receipts(Order.objects.filter(id__in=order_ids))
+        signal_order_status(order_ids)
+
+    return paid_count
+
+def reconcile_pending_payments(rate: float = 5.0, limit: int = None, log=print):
+    """
+    One reconciliation pass: drop expired QR images, ask PayWay about every
+    pending transaction (rate limited), then apply all confirmed payments as
+    a single batch.
+    Returns (checked, paid).
+    """
+    expire_qr_images()
+    limiter = RateLimiter(rate)
+    paid = []
+    tran_ids = pending_transaction_ids(limit=limit)
+
+    for tran_id in tran_ids:
+        limiter.wait()
+        try:
+            res = check_transaction(tran_id)
+        except Exception as e:
+            log(f"Error checking ABA for {tran_id}: {e}")
+            continue
+        if res.get('status', {}).get('code') == "00":
+            paid.append(tran_id)
+
+    return len(tran_ids), apply_paid_transactions(paid)
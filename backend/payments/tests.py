@@ -1,3 +1,291 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from payments.api import QR_DATA_URI_PREFIX, confirm_order_payment
+from payments.models import Payment
+from payments.reconciler import reconcile_pending_payments
+from payments.utils.aba_payway import CHECK_TRANSACTION_PATH, GENERATE_QR_PATH, PayWayClient, build_pushback_hash
+from payments.utils.mock_qr import render_mock_khqr_png
+from store.models import Category, Product, Order, OrderItem, Receipt, ReceiptItem, HourlySales, DailySales
+
+
+class ReceiptBackfillTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Tea')
+        self.product = Product.objects.create(category=category, name='Jasmine Tea', price=300)
+
+    def create_order(self, order_number, created_at, status='PAID'):
+        order = Order.objects.create(order_number=order_number, status=status, total_amount=600)
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, price_at_time=300)
+        # created_at is auto_now_add, so an old order has to be back-dated after insert
+        Order.objects.filter(id=order.id).update(created_at=created_at)
+        return order
+
+    def test_backfill_keeps_the_order_time(self):
+        placed = timezone.make_aware(datetime(2025, 3, 4, 10, 25))
+        self.create_order('ORD-OLD', placed)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('backfill_receipts', stdout=StringIO())
+
+        receipt = Receipt.objects.get(receipt_id='ORD-OLD')
+        self.assertEqual(receipt.created_at, placed)
+        self.assertEqual(list(ReceiptItem.objects.values_list('created_at', flat=True)), [placed])
+
+        total = HourlySales.objects.get(level='TOTAL')
+        self.assertEqual((total.hour, total.orders, total.revenue), (placed.replace(minute=0), 1, 600))
+        daily = DailySales.objects.get()
+        self.assertEqual((daily.day, daily.orders, daily.revenue), (placed.date(), 1, 600))
+
+
+class PayWayClientTests(TestCase):
+    def test_async_pool_uses_pool_size(self):
+        async def pool_limits():
+            client = PayWayClient(pool_size=3)._async_client()
+            try:
+                pool = client._transport._pool
+                return pool._max_connections, pool._max_keepalive_connections
+            finally:
+                await client.aclose()
+
+        self.assertEqual(asyncio.run(pool_limits()), (3, 3))
+
+    def test_5xx_is_replayed_for_check_transaction_only(self):
+        client = PayWayClient(max_retries=2, backoff_factor=0)
+        unavailable = mock.Mock(status_code=503)
+        unavailable.raise_for_status.side_effect = requests.HTTPError('503')
+
+        with mock.patch.object(client.session, 'post', return_value=unavailable) as post:
+            with self.assertRaises(requests.HTTPError):
+                client.generate_qr(amount=1.0, currency='USD', payment_option='abapay_khqr', tran_id='TRX-1')
+            self.assertEqual(post.call_count, 1)
+
+            post.reset_mock()
+            with self.assertRaises(requests.HTTPError):
+                client.check_transaction('TRX-1')
+            self.assertEqual(post.call_count, 3)
+
+    def test_async_5xx_is_replayed_for_check_transaction_only(self):
+        client = PayWayClient(max_retries=2, backoff_factor=0)
+        paths = []
+
+        def unavailable(request):
+            paths.append(request.url.path)
+            return httpx.Response(503)
+
+        async def call(method, **kwargs):
+            loop = asyncio.get_running_loop()
+            client._async_clients[loop] = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(unavailable))
+            try:
+                await method(**kwargs)
+            finally:
+                await client._async_clients[loop].aclose()
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            asyncio.run(call(client.agenerate_qr, amount=1.0, currency='USD', payment_option='abapay_khqr', tran_id='TRX-1'))
+        with self.assertRaises(httpx.HTTPStatusError):
+            asyncio.run(call(client.acheck_transaction, tran_id='TRX-1'))
+        self.assertEqual(paths, [GENERATE_QR_PATH] + [CHECK_TRANSACTION_PATH] * 3)
+
+
+class PaymentConfirmationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Tea')
+        product = Product.objects.create(category=category, name='Jasmine Tea', price=300)
+        self.order = Order.objects.create(order_number='ORD-PAY', status='PENDING', total_amount=600)
+        OrderItem.objects.create(order=self.order, product=product, quantity=2, price_at_time=300)
+        self.payment = Payment.objects.create(order=self.order, transaction_id='TRX-ORD-PAY', amount=600)
+
+    def pushback(self, payload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/payments/payway/callback', json.dumps(payload), content_type='application/json')
+
+    def signed(self, **fields):
+        payload = {'tran_id': 'TRX-ORD-PAY', 'apv': '123456', 'status': '0', **fields}
+        payload['hash'] = build_pushback_hash(payload)
+        return payload
+
+    def assert_paid_once(self):
+        self.order.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertEqual((self.order.status, self.payment.status), ('PAID', 'COMPLETED'))
+        self.assertEqual(Receipt.objects.filter(receipt_id='ORD-PAY').count(), 1)
+        self.assertEqual(ReceiptItem.objects.filter(receipt__receipt_id='ORD-PAY').count(), 1)
+
+    def test_missing_or_bad_hash_is_forbidden(self):
+        unsigned = {'tran_id': 'TRX-ORD-PAY', 'status': '0'}
+        tampered = {**self.signed(), 'tran_id': 'TRX-OTHER'}
+        for payload in (unsigned, tampered):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.pushback(payload).status_code, 403)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'PENDING')
+        self.assertFalse(Receipt.objects.exists())
+
+    def test_non_dict_payload_is_rejected(self):
+        self.assertEqual(self.pushback(['TRX-ORD-PAY']).status_code, 400)
+
+    def test_signed_pushback_pays_the_order(self):
+        response = self.pushback(self.signed())
+        self.assertEqual(response.status_code, 200)
+        self.assert_paid_once()
+
+    def test_repeated_pushback_is_a_no_op(self):
+        self.pushback(self.signed())
+        response = self.pushback(self.signed())
+        self.assertEqual(response.status_code, 200)
+        self.assert_paid_once()
+
+    def test_receipt_of_a_missing_order_is_not_found(self):
+        for fmt in ('pdf', 'escpos'):
+            with self.subTest(format=fmt):
+                response = self.client.get('/api/payments/orders/999999/receipt', {'format': fmt})
+                self.assertEqual(response.status_code, 404)
+
+    def test_reconciler_applies_paid_transactions_once(self):
+        paid = {'status': {'code': '00'}}
+        with mock.patch('payments.reconciler.check_transaction', return_value=paid) as check:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(reconcile_pending_payments(rate=0), (1, 1))
+            check.assert_called_once_with('TRX-ORD-PAY')
+            # Nothing is pending any more, so a second pass asks PayWay about nothing
+            self.assertEqual(reconcile_pending_payments(rate=0), (0, 0))
+        self.assert_paid_once()
+
+
+class OrderStatusStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.order = Order.objects.create(order_number='ORD-SSE', status='PENDING', total_amount=300)
+        self.payment = Payment.objects.create(order=self.order, transaction_id='TRX-ORD-SSE', amount=300)
+
+    def pay(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            confirm_order_payment(self.order, self.payment)
+
+    @mock.patch('payments.api.STATUS_STREAM_POLL_SECONDS', 0.01)
+    @mock.patch('payments.api.STATUS_STREAM_DB_SECONDS', 3600)
+    async def test_stream_reports_the_payment_then_closes(self):
+        response = await self.async_client.get(f'/api/payments/orders/{self.order.id}/events')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = response.streaming_content
+
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        self.assertIn(b'"status": "PENDING"', await anext(chunks))
+
+        # Only the cache signal can wake the stream: its database fallback is an hour away
+        await sync_to_async(self.pay)()
+        paid = await anext(chunks)
+        self.assertTrue(paid.startswith(b'event: status\n'))
+        self.assertIn(b'"status": "PAID", "payment_status": "COMPLETED"', paid)
+
+        rest = [chunk async for chunk in chunks]
+        self.assertEqual(rest, [])
+
+
+class CheckoutTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Tea')
+        self.product = Product.objects.create(category=category, name='Jasmine Tea', price=300)
+
+    async def checkout(self):
+        return await self.async_client.post(
+            '/api/payments/checkout',
+            {'items': [{'product_id': self.product.id, 'quantity': 2}], 'total_amount': 600},
+            content_type='application/json',
+        )
+
+    async def test_order_is_committed_before_the_gateway_is_awaited(self):
+        seen = {}
+
+        async def gateway(**kwargs):
+            # The order must already be visible outside any open transaction
+            seen['atomic'] = await sync_to_async(lambda: connection.in_atomic_block)()
+            seen['order'] = await Order.objects.filter(order_number=kwargs['tran_id'][len('TRX-'):]).aexists()
+            return {'hash': 'h', 'qrImage': None}
+
+        with mock.patch('payments.api.agenerate_qr', side_effect=gateway):
+            response = await self.checkout()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen, {'atomic': False, 'order': True})
+
+    @override_settings(DEBUG=True)
+    async def test_gateway_failure_falls_back_to_mock_qr_in_debug(self):
+        with mock.patch('payments.api.agenerate_qr', side_effect=httpx.ConnectError('down')):
+            response = await self.checkout()
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['qr_data']['qrImage'], f"/api/payments/orders/{data['order_id']}/qr.png")
+        payment = await Payment.objects.aget(order_id=data['order_id'])
+        self.assertTrue(bytes(payment.qr_image).startswith(b'\x89PNG'))
+
+
+class OrderQRTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Tea')
+        self.product = Product.objects.create(category=category, name='Jasmine Tea', price=300)
+        self.png = render_mock_khqr_png(6.0)
+
+    def checkout(self):
+        gateway = {'hash': 'h', 'qrImage': QR_DATA_URI_PREFIX + base64.b64encode(self.png).decode()}
+        with mock.patch('payments.api.agenerate_qr', return_value=gateway):
+            response = self.client.post(
+                '/api/payments/checkout',
+                {'items': [{'product_id': self.product.id, 'quantity': 2}], 'total_amount': 600},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_checkout_returns_only_the_qr_url(self):
+        data = self.checkout()
+        url = f"/api/payments/orders/{data['order_id']}/qr.png"
+        self.assertEqual(data['qr_data']['qrImage'], url)
+        self.assertNotIn('base64', json.dumps(data))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response.content, self.png)
+
+        etag = response['ETag']
+        self.assertEqual(etag, '"TRX-%s"' % data['order_number'])
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+
+    def test_qr_is_dropped_once_paid(self):
+        data = self.checkout()
+        order = Order.objects.get(id=data['order_id'])
+        confirm_order_payment(order, order.payments.get())
+
+        self.assertIsNone(Payment.objects.get(order=order).qr_image)
+        self.assertEqual(self.client.get(data['qr_data']['qrImage']).status_code, 404)
+
+    def test_qr_is_dropped_once_expired(self):
+        data = self.checkout()
+        Payment.objects.update(created_at=timezone.now() - timedelta(hours=1))
+
+        with mock.patch('payments.reconciler.check_transaction') as check:
+            reconcile_pending_payments(rate=0)
+        check.assert_not_called()
+        self.assertIsNone(Payment.objects.get(order_id=data['order_id']).qr_image)
@@ -2,14 +2,29 @@ import base64
 import hmac
 import hashlib
 import json
+import os
+import asyncio
+import time
+import weakref
 from datetime import datetime, timezone
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # CONSTANTS (Should ideally be in settings.py)
 PAYWAY_BASE = "https://checkout-sandbox.payway.com.kh"
 MERCHANT_ID = "ec463405"
 API_KEY = "bd58ff19a2376a80e958e4bb7bec941db9280d6e"  # HMAC secret key
-CALLBACK_URL = "https://webhook.site/be432763-57dc-4afe-8b87-64ad9983fbcd" # TODO: Change to real callback
+# Public URL of /api/payments/payway/callback for this deployment
+CALLBACK_URL = os.environ.get("PAYWAY_CALLBACK_URL", "https://webhook.site/be432763-57dc-4afe-8b87-64ad9983fbcd")
+
+# HTTP client tuning (overridable per deployment)
+PAYWAY_POOL_SIZE = int(os.environ.get("PAYWAY_POOL_SIZE", "10"))
+PAYWAY_MAX_RETRIES = int(os.environ.get("PAYWAY_MAX_RETRIES", "2"))
+PAYWAY_BACKOFF = float(os.environ.get("PAYWAY_BACKOFF", "0.5"))
+PAYWAY_CONNECT_TIMEOUT = float(os.environ.get("PAYWAY_CONNECT_TIMEOUT", "3.05"))
+PAYWAY_READ_TIMEOUT = float(os.environ.get("PAYWAY_READ_TIMEOUT", "30"))
 
 def utc_req_time() -> str:
     return datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
@@ -47,11 +62,25 @@ def build_generate_qr_hash(payload: dict) -> str:
     raw = "".join(null_to_empty(payload.get(k)) for k in fields_in_order)
     return hmac_sha512_b64(raw, API_KEY)
 
+def build_pushback_hash(payload: dict) -> str:
+    """
+    Pushback signature: values of every field except "hash", concatenated
+    in ascending key order, HMAC-SHA512 with the API key, base64 encoded.
+    """
+    raw = "".join(null_to_empty(payload[k]) for k in sorted(payload) if k != "hash")
+    return hmac_sha512_b64(raw, API_KEY)
+
+def verify_pushback(payload: dict) -> bool:
+    received = payload.get("hash")
+    if not received:
+        return False
+    return hmac.compare_digest(build_pushback_hash(payload), str(received))
+
 def build_check_txn_hash(req_time: str, merchant_id: str, tran_id: str) -> str:
     raw = f"{req_time}{merchant_id}{tran_id}"
     return hmac_sha512_b64(raw, API_KEY)
 
-def generate_qr(*, amount: float, currency: str, payment_option: str, tran_id: str) -> dict:
+def build_generate_qr_payload(*, amount: float, currency: str, payment_option: str, tran_id: str) -> dict:
     req_time = utc_req_time()
 
     currency = currency.upper()
@@ -94,22 +123,164 @@ def generate_qr(*, amount: float, currency: str, payment_option: str, tran_id: s
     }
 
     payload["hash"] = build_generate_qr_hash(payload)
+    return payload
 
-    url = f"{PAYWAY_BASE}/api/payment-gateway/v1/payments/generate-qr"
-    r = requests.post(url, json=payload, headers={"Content-Type": "application/json"}, timeout=30)
-    r.raise_for_status()
-    return r.json()
+GENERATE_QR_PATH = "/api/payment-gateway/v1/payments/generate-qr"
+CHECK_TRANSACTION_PATH = "/api/payment-gateway/v1/payments/check-transaction-2"
+RETRY_STATUSES = (500, 502, 503, 504)
 
-def check_transaction(tran_id: str) -> dict:
+def build_check_txn_payload(tran_id: str) -> dict:
     req_time = utc_req_time()
-    payload = {
+    return {
         "req_time": req_time,
         "merchant_id": MERCHANT_ID,
         "tran_id": tran_id,
         "hash": build_check_txn_hash(req_time, MERCHANT_ID, tran_id),
     }
 
-    url = f"{PAYWAY_BASE}/api/payment-gateway/v1/payments/check-transaction-2"
-    r = requests.post(url, json=payload, headers={"Content-Type": "application/json"}, timeout=30)
-    r.raise_for_status()
-    return r.json()
+class PayWayClient:
+    """
+    PayWay HTTP client that keeps connections alive between calls.
+
+    The sync side uses one requests.Session with a bounded connection pool; the
+    async side keeps one httpx.AsyncClient per event loop with the same pool
+    size. Both retry failed connects, which never reached the gateway. A 5xx
+    is only retried (with exponential backoff) for check-transaction, a read;
+    replaying generate-qr could create a second QR for the same tran_id.
+    Timeouts are split into connect and read so an unreachable gateway fails
+    fast while a slow-but-alive one still gets the full read window.
+    """
+
+    def __init__(
+        self,
+        base_url: str = PAYWAY_BASE,
+        pool_size: int = PAYWAY_POOL_SIZE,
+        max_retries: int = PAYWAY_MAX_RETRIES,
+        backoff_factor: float = PAYWAY_BACKOFF,
+        connect_timeout: float = PAYWAY_CONNECT_TIMEOUT,
+        read_timeout: float = PAYWAY_READ_TIMEOUT,
+        verify: bool = True,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.verify = verify
+
+        # Failed connects only: never replay a request the gateway may already have processed
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=0,
+            backoff_factor=backoff_factor,
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _timeout(self, connect_timeout=None, read_timeout=None):
+        return (
+            self.connect_timeout if connect_timeout is None else connect_timeout,
+            self.read_timeout if read_timeout is None else read_timeout,
+        )
+
+    def _attempts(self, retry_status: bool) -> int:
+        return self.max_retries + 1 if retry_status else 1
+
+    def post(self, path: str, payload: dict, *, retry_status=False, connect_timeout=None, read_timeout=None) -> dict:
+        attempts = self._attempts(retry_status)
+        for attempt in range(attempts):
+            r = self.session.post(
+                f"{self.base_url}{path}",
+                json=payload,
+                timeout=self._timeout(connect_timeout, read_timeout),
+                verify=self.verify,
+            )
+            if r.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                break
+            time.sleep(self.backoff_factor * (2 ** attempt))
+
+        r.raise_for_status()
+        return r.json()
+
+    def _async_client(self) -> httpx.AsyncClient:
+        # httpx connection pools are bound to the loop that opened them
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            # With an explicit transport httpx ignores client-level limits/verify, so they go here
+            transport = httpx.AsyncHTTPTransport(
+                retries=self.max_retries,
+                verify=self.verify,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Content-Type": "application/json"},
+                transport=transport,
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def apost(self, path: str, payload: dict, *, retry_status=False, connect_timeout=None, read_timeout=None) -> dict:
+        connect, read = self._timeout(connect_timeout, read_timeout)
+        timeout = httpx.Timeout(read, connect=connect)
+        client = self._async_client()
+
+        attempts = self._attempts(retry_status)
+        for attempt in range(attempts):
+            r = await client.post(path, json=payload, timeout=timeout)
+            if r.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                break
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+        r.raise_for_status()
+        return r.json()
+
+    def generate_qr(self, *, amount: float, currency: str, payment_option: str, tran_id: str, **timeouts) -> dict:
+        payload = build_generate_qr_payload(amount=amount, currency=currency, payment_option=payment_option, tran_id=tran_id)
+        return self.post(GENERATE_QR_PATH, payload, **timeouts)
+
+    async def agenerate_qr(self, *, amount: float, currency: str, payment_option: str, tran_id: str, **timeouts) -> dict:
+        payload = build_generate_qr_payload(amount=amount, currency=currency, payment_option=payment_option, tran_id=tran_id)
+        return await self.apost(GENERATE_QR_PATH, payload, **timeouts)
+
+    def check_transaction(self, tran_id: str, **timeouts) -> dict:
+        return self.post(CHECK_TRANSACTION_PATH, build_check_txn_payload(tran_id), retry_status=True, **timeouts)
+
+    async def acheck_transaction(self, tran_id: str, **timeouts) -> dict:
+        return await self.apost(CHECK_TRANSACTION_PATH, build_check_txn_payload(tran_id), retry_status=True, **timeouts)
+
+    def close(self):
+        self.session.close()
+
+_default_client = None
+
+def get_client() -> PayWayClient:
+    """Process-wide client, so every caller shares the same connection pool."""
+    global _default_client
+    if _default_client is None:
+        _default_client = PayWayClient()
+    return _default_client
+
+def generate_qr(*, amount: float, currency: str, payment_option: str, tran_id: str) -> dict:
+    return get_client().generate_qr(amount=amount, currency=currency, payment_option=payment_option, tran_id=tran_id)
+
+async def agenerate_qr(*, amount: float, currency: str, payment_option: str, tran_id: str) -> dict:
+    return await get_client().agenerate_qr(amount=amount, currency=currency, payment_option=payment_option, tran_id=tran_id)
+
+def check_transaction(tran_id: str) -> dict:
+    return get_client().check_transaction(tran_id)
+
+async def acheck_transaction(tran_id: str) -> dict:
+    return await get_client().acheck_transaction(tran_id)
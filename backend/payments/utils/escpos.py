@@ -0,0 +1,65 @@
+from store.models import Order
+from .receipt import CAMBODIA_TZ, prefetch_receipt_items
+
+# ESC/POS control sequences
+ESC = b"\x1b"
+GS = b"\x1d"
+INIT = ESC + b"@"
+ALIGN_LEFT = ESC + b"a\x00"
+ALIGN_CENTER = ESC + b"a\x01"
+BOLD_ON = ESC + b"E\x01"
+BOLD_OFF = ESC + b"E\x00"
+SIZE_NORMAL = GS + b"!\x00"
+SIZE_DOUBLE = GS + b"!\x11"  # Double width and height
+FEED_AND_CUT = ESC + b"d\x04" + GS + b"V\x42\x00"
+
+# Characters per line in Font A: 48 on 80 mm paper, 32 on 58 mm paper
+RECEIPT_COLUMNS = 48
+
+def _text(value: str) -> bytes:
+    # Printer code pages vary; plain ASCII prints the same everywhere
+    return value.encode("ascii", "replace") + b"\n"
+
+def _columns(left: str, right: str, width: int) -> bytes:
+    left = left[:max(width - len(right) - 1, 0)]
+    return _text(left + " " * (width - len(left) - len(right)) + right)
+
+def render_order_receipt_escpos(order: Order, columns: int = RECEIPT_COLUMNS) -> bytes:
+    """Same content as the PDF receipt, as a raw ESC/POS byte stream for thermal printers."""
+    prefetch_receipt_items(order)
+    local_time = order.created_at.astimezone(CAMBODIA_TZ)
+    rule = _text("-" * columns)
+
+    out = [
+        INIT,
+        # --- Header ---
+        ALIGN_CENTER, BOLD_ON, SIZE_DOUBLE, _text("RABBIT KIOSK"), SIZE_NORMAL, BOLD_OFF,
+        _text("~ Freshly Brewed Happiness ~"),
+        ALIGN_LEFT, rule,
+        # --- Order Info ---
+        BOLD_ON, _text(f"RECEIPT: {order.order_number}"), BOLD_OFF,
+        _text(f"Date: {local_time.strftime('%d %b %Y, %I:%M %p')}"),
+        _text("Region: Cambodia (GMT+7)"),
+        rule,
+        # --- Items ---
+        BOLD_ON, _columns("MENU ITEM", "PRICE", columns), BOLD_OFF,
+    ]
+    for item in order.items.all():
+        out.append(_columns(f"{item.quantity}x {item.product.name}", f"${(item.line_total / 100.0):.2f}", columns))
+
+    out += [
+        rule,
+        # --- Totals ---
+        BOLD_ON, _columns("TOTAL DUE", f"${(order.total_amount / 100.0):.2f}", columns), BOLD_OFF,
+        # --- Footer ---
+        ALIGN_CENTER, b"\n", _text("Hop back in soon!"),
+        FEED_AND_CUT,
+    ]
+    return b"".join(out)
+
+def generate_order_receipt_escpos(order_id: int):
+    try:
+        order = Order.objects.get(id=order_id)
+    except Order.DoesNotExist:
+        return None
+    return render_order_receipt_escpos(order)
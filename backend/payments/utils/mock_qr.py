@@ -1,54 +1,97 @@
 import os
 import io
 import base64
+from functools import lru_cache
 import qrcode
 from PIL import Image, ImageDraw, ImageFont
 
-def generate_mock_khqr_base64(amount_usd, shop_name="Rabbit Cafe"):
-    # 1. Image dimensions and styling
-    width = 400
-    height = 550
-    bg_color = (255, 255, 255)
-    header_color = (204, 25, 30) # KHQR Red
+# 1. Image dimensions and styling
+WIDTH = 400
+HEIGHT = 550
+BG_COLOR = (255, 255, 255)
+HEADER_COLOR = (204, 25, 30) # KHQR Red
 
-    img = Image.new('RGB', (width, height), bg_color)
-    draw = ImageDraw.Draw(img)
+QR_SIZE = 300
+QR_X = (WIDTH - QR_SIZE) // 2
+QR_Y = 210
+LOGO_SIZE = 50
+
+# Finished PNGs kept per process, keyed by (amount, shop name)
+RENDER_CACHE_SIZE = 256
 
-    # 2. Draw Top Red Header Toolbar 
-    draw.rectangle([0, 0, width, 70], fill=header_color)
-    
+@lru_cache(maxsize=1)
+def _fonts():
     # Try loading fonts, fallback to default
     try:
-        font_large = ImageFont.truetype("arialbd.ttf", 36)
-        font_medium = ImageFont.truetype("arial.ttf", 22)
-        font_small = ImageFont.truetype("arial.ttf", 16)
-        font_header = ImageFont.truetype("arialbd.ttf", 28)
+        return {
+            "large": ImageFont.truetype("arialbd.ttf", 36),
+            "medium": ImageFont.truetype("arial.ttf", 22),
+            "small": ImageFont.truetype("arial.ttf", 16),
+            "header": ImageFont.truetype("arialbd.ttf", 28),
+        }
     except IOError:
-        font_large = ImageFont.load_default()
-        font_medium = ImageFont.load_default()
-        font_small = ImageFont.load_default()
-        font_header = ImageFont.load_default()
+        default = ImageFont.load_default()
+        return {"large": default, "medium": default, "small": default, "header": default}
+
+@lru_cache(maxsize=1)
+def _base_canvas():
+    """Static chrome shared by every render: header, KHQR title and separator."""
+    fonts = _fonts()
+    img = Image.new('RGB', (WIDTH, HEIGHT), BG_COLOR)
+    draw = ImageDraw.Draw(img)
+
+    # 2. Draw Top Red Header Toolbar
+    draw.rectangle([0, 0, WIDTH, 70], fill=HEADER_COLOR)
 
     # Draw "KHQR" text in header (approximate logo look)
     khqr_text = "KHQR"
-    bbox = draw.textbbox((0, 0), khqr_text, font=font_header)
+    bbox = draw.textbbox((0, 0), khqr_text, font=fonts["header"])
     w = bbox[2] - bbox[0]
-    draw.text(((width - w) / 2, 20), khqr_text, fill=(255, 255, 255), font=font_header)
-    
-    # Optional styling: bottom right red triangle tab (like in some designs)
-    draw.polygon([(width-40, 70), (width, 70), (width, 110)], fill=header_color)
+    draw.text(((WIDTH - w) / 2, 20), khqr_text, fill=(255, 255, 255), font=fonts["header"])
 
-    # 3. Draw Shop Name and Amount
-    draw.text((30, 90), shop_name, fill=(50, 50, 50), font=font_medium)
-    
-    amount_text = f"$ {amount_usd:.2f}"
-    draw.text((30, 125), amount_text, fill=(0, 0, 0), font=font_large)
+    # Optional styling: bottom right red triangle tab (like in some designs)
+    draw.polygon([(WIDTH-40, 70), (WIDTH, 70), (WIDTH, 110)], fill=HEADER_COLOR)
 
     # 4. Draw Dashed separator line
     dash_length = 5
-    for x in range(20, width - 20, dash_length * 2):
+    for x in range(20, WIDTH - 20, dash_length * 2):
         draw.line([(x, 185), (x + dash_length, 185)], fill=(200, 200, 200), width=2)
 
+    return img
+
+@lru_cache(maxsize=1)
+def _logo_badge():
+    """The central red "C" logo, pre-drawn with a circular paste mask."""
+    font = _fonts()["medium"]
+    outer = LOGO_SIZE + 10
+    badge = Image.new('RGB', (outer + 1, outer + 1), BG_COLOR)  # Ellipse bounds are inclusive
+    mask = Image.new('L', badge.size, 0)
+    draw = ImageDraw.Draw(badge)
+
+    # White background for logo circle
+    draw.ellipse([0, 0, outer, outer], fill=(255, 255, 255))
+    ImageDraw.Draw(mask).ellipse([0, 0, outer, outer], fill=255)
+    # Red circle
+    draw.ellipse([5, 5, 5 + LOGO_SIZE, 5 + LOGO_SIZE], fill=HEADER_COLOR)
+    # White C in middle
+    bbox = draw.textbbox((0, 0), "C", font=font)
+    w = bbox[2] - bbox[0]
+    h = bbox[3] - bbox[1]
+    draw.text((5 + (LOGO_SIZE - w)/2, 5 + (LOGO_SIZE - h)/2 - 2), "C", fill=(255, 255, 255), font=font)
+    return badge, mask
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_mock_khqr_png(amount_usd: float, shop_name: str = "Rabbit Cafe") -> bytes:
+    fonts = _fonts()
+    img = _base_canvas().copy()
+    draw = ImageDraw.Draw(img)
+
+    # 3. Draw Shop Name and Amount
+    draw.text((30, 90), shop_name, fill=(50, 50, 50), font=fonts["medium"])
+
+    amount_text = f"$ {amount_usd:.2f}"
+    draw.text((30, 125), amount_text, fill=(0, 0, 0), font=fonts["large"])
+
     # 5. Generate actual QR code (Pointless data but looks real)
     qr = qrcode.QRCode(
         version=1,
@@ -59,36 +102,30 @@ def generate_mock_khqr_base64(amount_usd, shop_name="Rabbit Cafe"):
     qr.add_data(f"MOCK_KHQR_DATA_FOR_AMOUNT_{amount_usd}")
     qr.make(fit=True)
     qr_img = qr.make_image(fill_color="black", back_color="white").convert('RGB')
-    
+
     # Resize QR to fit nicely
-    qr_size = 300
-    qr_img = qr_img.resize((qr_size, qr_size))
-    
+    qr_img = qr_img.resize((QR_SIZE, QR_SIZE))
+
     # 6. Paste QR code into main image
-    qr_x = (width - qr_size) // 2
-    qr_y = 210
-    img.paste(qr_img, (qr_x, qr_y))
+    img.paste(qr_img, (QR_X, QR_Y))
 
     # 7. Draw the central Red Logo inside the QR code
-    logo_size = 50
-    logo_x = qr_x + (qr_size - logo_size) // 2
-    logo_y = qr_y + (qr_size - logo_size) // 2
-    
-    # White background for logo circle
-    draw.ellipse([logo_x-5, logo_y-5, logo_x+logo_size+5, logo_y+logo_size+5], fill=(255,255,255))
-    # Red circle
-    draw.ellipse([logo_x, logo_y, logo_x+logo_size, logo_y+logo_size], fill=header_color)
-    # White C in middle
-    bbox = draw.textbbox((0, 0), "C", font=font_medium)
-    w = bbox[2] - bbox[0]
-    h = bbox[3] - bbox[1]
-    draw.text((logo_x + (logo_size - w)/2, logo_y + (logo_size - h)/2 - 2), "C", fill=(255, 255, 255), font=font_medium)
+    badge, mask = _logo_badge()
+    logo_x = QR_X + (QR_SIZE - LOGO_SIZE) // 2
+    logo_y = QR_Y + (QR_SIZE - LOGO_SIZE) // 2
+    img.paste(badge, (logo_x - 5, logo_y - 5), mask)
 
-    # 8. Encode to Base64
     buffer = io.BytesIO()
     img.save(buffer, format="PNG")
-    img_str = base64.b64encode(buffer.getvalue()).decode("utf-8")
-    
+    return buffer.getvalue()
+
+def generate_mock_khqr_base64(amount_usd, shop_name="Rabbit Cafe"):
+    # Normalise the cache key so 4.5 and 4.50000001 share one render
+    png = render_mock_khqr_png(round(float(amount_usd), 2), shop_name)
+
+    # 8. Encode to Base64
+    img_str = base64.b64encode(png).decode("utf-8")
+
     # Return as data URI
     return f"data:image/png;base64,{img_str}"
 
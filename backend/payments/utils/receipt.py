@@ -2,22 +2,77 @@ from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.colors import HexColor
 from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab import rl_config
 from io import BytesIO
-from store.models import Order
+from functools import lru_cache
+from PIL import Image
+from store.models import Order, OrderItem
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
 import datetime
 import pytz
 import os
 
-def generate_order_receipt_pdf(order_id: int):
+# PDFs are served over HTTP as binary, so skip reportlab's ASCII85 pass
+# (pure Python here, and most of the render time for the logo image).
+rl_config.useA85 = 0
+
+# Bump when the layout changes so cached PDFs are regenerated
+RECEIPT_TEMPLATE_VERSION = 1
+RECEIPT_CACHE_TTL = 60 * 60 * 24
+
+STRAWBERRY = "🍓"
+STRAWBERRY_FONT = ("Helvetica", 30)
+# Pattern glyph origins, already shifted left for centring
+STRAWBERRY_POSITIONS = [
+    (40 + i*60 - stringWidth(STRAWBERRY, *STRAWBERRY_FONT) / 2, 40 + j*80)
+    for i in range(5)
+    for j in range(8)
+]
+
+@lru_cache(maxsize=1)
+def _logo():
+    """
+    The logo decoded once per process and downscaled to 3x its 80pt print size,
+    so each receipt embeds a small image instead of the full source PNG.
+    """
+    logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'rabbit_logo.png')
+    if not os.path.exists(logo_path):
+        return None
+    img = Image.open(logo_path)
+    img.thumbnail((240, 240))
+    return ImageReader(img)
+
+CAMBODIA_TZ = pytz.timezone('Asia/Phnom_Penh')
+
+def prefetch_receipt_items(order: Order):
+    """Loads the order lines and their products in one extra query."""
+    prefetch_related_objects([order], Prefetch('items', queryset=OrderItem.objects.select_related('product')))
+
+def receipt_cache_key(order: Order) -> str:
+    return f"receipt-pdf:v{RECEIPT_TEMPLATE_VERSION}:{order.id}:{order.updated_at.timestamp()}"
+
+def generate_order_receipt_pdf(order_id: int, use_cache: bool = True):
     try:
         order = Order.objects.get(id=order_id)
     except Order.DoesNotExist:
         return None
 
+    key = receipt_cache_key(order)
+    pdf = cache.get(key) if use_cache else None
+    if pdf is None:
+        pdf = render_order_receipt_pdf(order)
+        cache.set(key, pdf, RECEIPT_CACHE_TTL)
+
+    return BytesIO(pdf)
+
+def render_order_receipt_pdf(order: Order) -> bytes:
+    prefetch_receipt_items(order)
+
     # Cambodia Time Adjustment
-    cambodia_tz = pytz.timezone('Asia/Phnom_Penh')
-    local_time = order.created_at.astimezone(cambodia_tz)
+    local_time = order.created_at.astimezone(CAMBODIA_TZ)
 
     buffer = BytesIO()
     width, height = (320, 650)
@@ -34,18 +89,19 @@ def generate_order_receipt_pdf(order_id: int):
     p.roundRect(10, 10, width-20, height-20, 15, fill=1, stroke=1)
 
     # --- Strawberry Background Pattern (Subtle) ---
-    p.setFont("Helvetica", 30)
     p.setFillColor(HexColor("#FFB7C5")) # Very light pink
     p.setFillAlpha(0.15) # High transparency
-    for i in range(5):
-        for j in range(8):
-            p.drawCentredString(40 + i*60, 40 + j*80, "🍓")
+    pattern = p.beginText()
+    pattern.setFont(*STRAWBERRY_FONT)
+    for x, y in STRAWBERRY_POSITIONS:
+        pattern.setTextOrigin(x, y)
+        pattern.textOut(STRAWBERRY)
+    p.drawText(pattern)
     p.setFillAlpha(1.0) # Reset transparency
 
     # --- Logo Placement ---
-    logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'rabbit_logo.png')
-    if os.path.exists(logo_path):
-        logo = ImageReader(logo_path)
+    logo = _logo()
+    if logo:
         # Center the logo at the top
         p.drawImage(logo, width/2 - 40, height - 100, width=80, height=80, mask='auto', preserveAspectRatio=True)
     
@@ -122,5 +178,4 @@ def generate_order_receipt_pdf(order_id: int):
     p.showPage()
     p.save()
 
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
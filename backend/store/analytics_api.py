@@ -1,16 +1,23 @@
+import functools
 from datetime import timedelta, datetime
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Sum, Count, F, Value, DecimalField
-from django.db.models.functions import TruncDate, TruncHour, TruncWeek, ExtractWeekDay, ExtractHour, Cast
+from django.db.models import Sum, Q, F, Case, When, Value, BooleanField, DateTimeField
+from django.db.models.functions import TruncDate, ExtractHour
 from ninja import Router, Schema
 from typing import List, Optional
-from store.models import Receipt, ReceiptItem
+from store.models import HourlySales, DailySales
+from store.rollups import rollup_queryset, rollup_filter, rollup_version, ROLLUP_METRICS, WEEKDAY_NAMES
+from store.engine import engine_enabled, get_snapshot
+from store.exports import EXPORT_COLUMNS, HAS_PYARROW, export_rows, iter_csv, iter_parquet, aiter_chunks
 
 router = Router()
 
 def get_date_range(start: Optional[str] = None, end: Optional[str] = None):
-    # Default to last 30 days if dates are not provided
-    today = timezone.now()
+    # Default to the last 30 whole days if dates are not provided
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
     end_date = today
     start_date = today - timedelta(days=30)
     
@@ -21,6 +28,38 @@ def get_date_range(start: Optional[str] = None, end: Optional[str] = None):
         
     return start_date, end_date + timedelta(days=1)  # Include the whole end day
 
+# Ranges that include today are also dropped on every receipt insert (see store.rollups)
+ANALYTICS_LIVE_TTL = 60
+ANALYTICS_CLOSED_TTL = 24 * 60 * 60  # Closed periods only change on back-fills, which bump the version
+
+def cached_analytics(view):
+    """
+    Caches an analytics endpoint's result under its name, the resolved date
+    range and the remaining query parameters. Keys carry the RollupVersion
+    counter, so a refresh from any process retires them: closed ranges move
+    when past rollup hours are rewritten, ranges reaching today on every
+    refresh. Both also expire on a TTL as a backstop.
+    """
+    @functools.wraps(view)
+    def wrapper(request, start: Optional[str] = None, end: Optional[str] = None, **params):
+        start_date, end_date = get_date_range(start, end)
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        closed = end_date <= today
+
+        filters = ":".join(f"{k}={v}" for k, v in sorted(params.items()) if v is not None)
+        key = "analytics:{}:{}:{:%Y-%m-%d}:{:%Y-%m-%d}:{}".format(
+            view.__name__,
+            rollup_version('history' if closed else 'live'),
+            start_date, end_date, filters
+        )
+
+        result = cache.get(key)
+        if result is None:
+            result = view(request, start=start, end=end, **params)
+            cache.set(key, result, ANALYTICS_CLOSED_TTL if closed else ANALYTICS_LIVE_TTL)
+        return result
+    return wrapper
+
 class KPIResponse(Schema):
     total_revenue: float
     total_orders: int
@@ -28,28 +67,34 @@ class KPIResponse(Schema):
     avg_items_per_order: float
 
 @router.get("/kpi", response=KPIResponse)
-def get_kpi(request, start: Optional[str] = None, end: Optional[str] = None):
+@cached_analytics
+def get_kpi(request, start: Optional[str] = None, end: Optional[str] = None, source: Optional[str] = None):
     start_date, end_date = get_date_range(start, end)
+    if engine_enabled():
+        return get_snapshot().kpi(start_date, end_date, source=source)
     
-    qs = Receipt.objects.filter(created_at__range=(start_date, end_date))
+    # Whole local days (see get_date_range), answered from the per-day table
+    qs = DailySales.objects.filter(day__gte=start_date.date(), day__lt=end_date.date())
+    if source:
+        qs = qs.filter(source=source)
     
     aggs = qs.aggregate(
-        tot_rev=Sum('total_amount'),
-        tot_orders=Count('id'),
-        tot_items=Sum('total_items')
+        tot_rev=Sum('revenue'),
+        tot_orders=Sum('orders'),
+        tot_items=Sum('quantity')
     )
     
-    tot_rev = aggs['tot_rev'] or 0.0
+    tot_rev = aggs['tot_rev'] or 0
     tot_orders = aggs['tot_orders'] or 0
     tot_items = aggs['tot_items'] or 0
     
-    avg_order_value = float(tot_rev) / tot_orders if tot_orders > 0 else 0.0
-    avg_items_per_order = float(tot_items) / tot_orders if tot_orders > 0 else 0.0
+    avg_order_value = tot_rev / tot_orders if tot_orders > 0 else 0.0
+    avg_items_per_order = tot_items / tot_orders if tot_orders > 0 else 0.0
     
     return {
-        "total_revenue": float(tot_rev) * 100,
+        "total_revenue": float(tot_rev),
         "total_orders": tot_orders,
-        "avg_order_value": avg_order_value * 100,
+        "avg_order_value": avg_order_value,
         "avg_items_per_order": avg_items_per_order
     }
 
@@ -59,16 +104,18 @@ class DailySalesResponse(Schema):
     revenue: float
 
 @router.get("/daily", response=List[DailySalesResponse])
-def get_daily_sales(request, start: Optional[str] = None, end: Optional[str] = None):
+@cached_analytics
+def get_daily_sales(request, start: Optional[str] = None, end: Optional[str] = None, source: Optional[str] = None):
     start_date, end_date = get_date_range(start, end)
+    if engine_enabled():
+        return get_snapshot().daily(start_date, end_date, source=source)
     
-    qs = (Receipt.objects
-          .filter(created_at__range=(start_date, end_date))
-          .annotate(date=TruncDate('created_at'))
+    qs = (rollup_queryset(start_date, end_date, source=source)
+          .annotate(date=TruncDate('hour'))
           .values('date')
           .annotate(
-              orders=Count('id'),
-              revenue=Sum('total_amount')
+              total_orders=Sum('orders'),
+              total_revenue=Sum('revenue')
           )
           .order_by('date'))
           
@@ -76,8 +123,8 @@ def get_daily_sales(request, start: Optional[str] = None, end: Optional[str] = N
     for item in qs:
         results.append({
             "date": item['date'].strftime('%Y-%m-%d') if item['date'] else "",
-            "orders": item['orders'],
-            "revenue": float(item['revenue'] or 0) * 100
+            "orders": item['total_orders'],
+            "revenue": float(item['total_revenue'] or 0)
         })
     return results
 
@@ -87,36 +134,36 @@ class HourlySalesResponse(Schema):
     revenue: float
 
 @router.get("/hourly", response=List[HourlySalesResponse])
-def get_hourly_sales(request, start: Optional[str] = None, end: Optional[str] = None):
+@cached_analytics
+def get_hourly_sales(request, start: Optional[str] = None, end: Optional[str] = None, source: Optional[str] = None):
     start_date, end_date = get_date_range(start, end)
+    if engine_enabled():
+        return get_snapshot().hourly(start_date, end_date, source=source)
     
     # Filter for operating hours 7 to 17
     # Note: Extracting just the hour for aggregation across all days in range
     # TruncHour retains the exact datetime hour (e.g. 2025-01-01 07:00:00).
     # To aggregate by hour-of-day regardless of date, we do:
-    qs = Receipt.objects.filter(created_at__range=(start_date, end_date))
+    qs = rollup_queryset(start_date, end_date, source=source)
     
     # Since we want a universal hour 7-17 aggregation independent of the specific day:
-    # Django 3.2+ ExtractHour might be simpler, but let's do it directly
-    from django.db.models.functions import ExtractHour
-    
-    qs = (qs.annotate(hour=ExtractHour('created_at'))
-            .filter(hour__gte=7, hour__lte=17)
-            .values('hour')
+    qs = (qs.annotate(hour_of_day=ExtractHour('hour'))
+            .filter(hour_of_day__gte=7, hour_of_day__lte=17)
+            .values('hour_of_day')
             .annotate(
-                orders=Count('id'),
-                revenue=Sum('total_amount')
+                total_orders=Sum('orders'),
+                total_revenue=Sum('revenue')
             )
-            .order_by('hour'))
+            .order_by('hour_of_day'))
             
     # Fill in blanks so array is uniformly 7 through 17
     hour_dict = {h: {"orders": 0, "revenue": 0.0} for h in range(7, 18)}
     
     for item in qs:
-        h = item['hour']
+        h = item['hour_of_day']
         if h in hour_dict:
-            hour_dict[h]['orders'] = item['orders']
-            hour_dict[h]['revenue'] = float(item['revenue'] or 0) * 100
+            hour_dict[h]['orders'] = item['total_orders']
+            hour_dict[h]['revenue'] = float(item['total_revenue'] or 0)
             
     results = []
     for h in range(7, 18):
@@ -134,24 +181,30 @@ class TopProductResponse(Schema):
     revenue: float
 
 @router.get("/top-products", response=List[TopProductResponse])
-def get_top_products(request, start: Optional[str] = None, end: Optional[str] = None, limit: int = 10):
+@cached_analytics
+def get_top_products(request, start: Optional[str] = None, end: Optional[str] = None, limit: int = 10, source: Optional[str] = None):
     start_date, end_date = get_date_range(start, end)
+    if engine_enabled():
+        return get_snapshot().top_products(start_date, end_date, limit=limit, source=source)
     
-    qs = (ReceiptItem.objects
-          .filter(receipt__created_at__range=(start_date, end_date))
-          .values('product_name_snapshot')
+    qs = HourlySales.objects.filter(level='PRODUCT', hour__gte=start_date, hour__lt=end_date)
+    if source:
+        qs = qs.filter(source=source)
+
+    qs = (qs
+          .values('product_name')
           .annotate(
-              total_qty=Sum('qty'),
-              total_revenue=Sum('line_total')
+              total_qty=Sum('quantity'),
+              total_revenue=Sum('revenue')
           )
           .order_by('-total_qty')[:limit])
           
     results = []
     for item in qs:
         results.append({
-            "product_name": item['product_name_snapshot'],
+            "product_name": item['product_name'],
             "qty": item['total_qty'],
-            "revenue": float(item['total_revenue'] or 0) * 100
+            "revenue": float(item['total_revenue'] or 0)
         })
     return results
 
@@ -176,6 +229,7 @@ class TimeSeriesResponse(Schema):
     breakdown: Optional[TimeSeriesBreakdown] = None
 
 @router.get("/timeseries", response=TimeSeriesResponse)
+@cached_analytics
 def get_timeseries(
     request, 
     metric: str = "revenue", 
@@ -183,76 +237,63 @@ def get_timeseries(
     start: Optional[str] = None, 
     end: Optional[str] = None,
     category_id: Optional[int] = None,
-    product_id: Optional[int] = None
+    product_id: Optional[int] = None,
+    source: Optional[str] = None
 ):
     start_date, end_date = get_date_range(start, end)
+    if engine_enabled():
+        return get_snapshot().timeseries(metric, freq, start_date, end_date, category_id=category_id, product_id=product_id, source=source)
     
-    # 1. Base QuerySet Setup
-    if category_id or product_id:
-        qs = ReceiptItem.objects.filter(receipt__created_at__range=(start_date, end_date))
-        if category_id:
-            qs = qs.filter(product__category_id=category_id)
-        if product_id:
-            qs = qs.filter(product_id=product_id)
-            
-        date_field = 'receipt__created_at'
-        revenue_field = 'line_total'
-    elif metric == 'quantity':
-        qs = ReceiptItem.objects.filter(receipt__created_at__range=(start_date, end_date))
-        date_field = 'receipt__created_at'
-        revenue_field = 'line_total' # Unused for quantity, but kept for consistency
-    else:
-        qs = Receipt.objects.filter(created_at__range=(start_date, end_date))
-        date_field = 'created_at'
-        revenue_field = 'total_amount'
-
-    # 2. Aggregation Setup
-    if freq == 'H':
-        trunc_func = TruncHour(date_field)
-    elif freq == 'W':
-        trunc_func = TruncWeek(date_field)
-    else:
-        trunc_func = TruncDate(date_field)
-
-    if metric == 'orders':
-        if category_id or product_id:
-            agg_expr = Count('receipt', distinct=True)
-        else:
-            agg_expr = Count('id')
-    elif metric == 'quantity':
-        agg_expr = Sum('qty')
-    else:
-        agg_expr = Sum(revenue_field)
+    # 1. One grouped pass over the rollup: rows matching the filters keep their
+    #    hour and feed the series and hour/weekday breakdowns, the remaining
+    #    CATEGORY rows collapse to one row per category for category_tot
+    selected = rollup_filter(category_id, product_id)
+    rows = HourlySales.objects.filter(selected | Q(level='CATEGORY'), hour__gte=start_date, hour__lt=end_date)
+    if source:
+        rows = rows.filter(source=source)
 
-    # 3. Time Series Data
-    series_qs = (
-        qs.annotate(ds=trunc_func)
-          .values('ds')
-          .annotate(y=agg_expr)
-          .order_by('ds')
+    rows = (
+        rows
+          .annotate(
+              selected=Case(When(selected, then=Value(True)), default=Value(False), output_field=BooleanField()),
+              bucket=Case(When(selected, then=F('hour')), default=Value(None), output_field=DateTimeField()),
+          )
+          .values('bucket', 'level', 'category_name', 'selected')
+          .annotate(y=Sum(ROLLUP_METRICS.get(metric, 'revenue')))
+          .order_by('bucket')
     )
 
-    series_data = []
-    y_values = []
-    
-    for item in series_qs:
-        dt = item['ds']
-        if not dt:
+    # 2. Fold the hourly rows into every view
+    series_tot = {}
+    hour_tot = {}
+    wd_tot = {}
+    cat_tot = {}
+
+    tz = timezone.get_current_timezone()
+    for row in rows:
+        y = row['y'] or 0
+        if row['level'] == 'CATEGORY' and row['category_name']:
+            cat_tot[row['category_name']] = cat_tot.get(row['category_name'], 0) + y
+        if not row['selected']:
             continue
-            
+
+        dt = row['bucket'].astimezone(tz)
         if freq == 'H':
-            dt_str = dt.strftime('%Y-%m-%d %H:00')
+            key = dt
+        elif freq == 'W':
+            key = dt.date() - timedelta(days=dt.weekday())
         else:
-            dt_str = dt.strftime('%Y-%m-%d')
-            
-        y_val = float(item['y'] or 0)
-        
-        # If revenue, multiply by 100 to match frontend's cents setup
-        if metric == 'revenue':
-            y_val *= 100
-            
-        series_data.append({"ds": dt_str, "y": y_val})
-        y_values.append(y_val)
+            key = dt.date()
+
+        series_tot[key] = series_tot.get(key, 0) + y
+        hour_tot[dt.hour] = hour_tot.get(dt.hour, 0) + y
+        wd = WEEKDAY_NAMES[dt.weekday()]
+        wd_tot[wd] = wd_tot.get(wd, 0) + y
+
+    # 3. Time Series Data
+    ds_format = '%Y-%m-%d %H:00' if freq == 'H' else '%Y-%m-%d'
+    series_data = [{"ds": key.strftime(ds_format), "y": float(y)} for key, y in series_tot.items()]
+    y_values = [point["y"] for point in series_data]
 
     # 4. Summary Calculation
     if y_values:
@@ -266,68 +307,54 @@ def get_timeseries(
         summary = {"total": 0.0, "avg": 0.0, "min": 0.0, "max": 0.0}
 
     # 5. Breakdown (Weekday & Hour of day, Category)
-    breakdown = {"weekday_avg": {}, "hour_avg": {}, "category_tot": {}}
-    
     unique_days = max((end_date - start_date).days, 1)
     weeks_count = max(unique_days / 7.0, 1.0)
-    
-    # Hour aggregation
-    hour_qs = (
-        qs.annotate(h=ExtractHour(date_field))
-          .values('h')
-          .annotate(y=agg_expr)
-    )
-    
-    for item in hour_qs:
-        h_val = item['h']
-        if h_val is not None:
-            val = float(item['y'] or 0)
-            if metric == 'revenue':
-                val *= 100
-            breakdown["hour_avg"][str(h_val)] = round(val / unique_days, 2)
-
-    # Weekday aggregation 
-    wd_qs = (
-        qs.annotate(wd=ExtractWeekDay(date_field))
-          .values('wd')
-          .annotate(y=agg_expr)
-    )
-    
-    # ExtractWeekDay returns 1 (Sunday) to 7 (Saturday) in Django
-    wd_map = {1: 'Sun', 2: 'Mon', 3: 'Tue', 4: 'Wed', 5: 'Thu', 6: 'Fri', 7: 'Sat'}
-    
-    for item in wd_qs:
-        wd_val = item['wd']
-        if wd_val is not None and wd_val in wd_map:
-            val = float(item['y'] or 0)
-            if metric == 'revenue':
-                val *= 100
-            breakdown["weekday_avg"][wd_map[wd_val]] = round(val / weeks_count, 2)
-
-    # Category aggregation
-    cat_base_qs = ReceiptItem.objects.filter(receipt__created_at__range=(start_date, end_date))
-    
-    if metric == 'orders':
-        cat_agg_expr = Count('receipt', distinct=True)
-    elif metric == 'quantity':
-        cat_agg_expr = Sum('qty')
-    else:
-        cat_agg_expr = Sum('line_total')
-        
-    cat_qs = (
-        cat_base_qs.values('product__category__name')
-          .annotate(y=cat_agg_expr)
-    )
-    for item in cat_qs:
-        cat_name = item['product__category__name']
-        if cat_name is not None:
-            val = float(item['y'] or 0)
-            if metric == 'revenue':
-                val *= 100
-            breakdown["category_tot"][cat_name] = round(val, 2)
+
+    breakdown = {
+        "weekday_avg": {wd: round(float(y) / weeks_count, 2) for wd, y in wd_tot.items()},
+        "hour_avg": {str(h): round(float(y) / unique_days, 2) for h, y in sorted(hour_tot.items())},
+        "category_tot": {name: round(float(y), 2) for name, y in cat_tot.items()},
+    }
 
     return {
         "series": series_data,
         "summary": summary,
         "breakdown": breakdown
     }
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', iter_csv),
+    'parquet': ('application/vnd.apache.parquet', iter_parquet),
+}
+
+@router.get("/export", response={200: None, 400: dict})
+def export_sales(
+    request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    source: Optional[str] = None,
+    table: str = "items",
+    format: str = "csv"
+):
+    """
+    Streams raw receipts or line items for a date range as CSV or Parquet.
+    Rows are read with a server-side cursor and written a chunk at a time,
+    so memory stays flat for full-year extracts.
+    """
+    if table not in EXPORT_COLUMNS:
+        return 400, {"error": f"Unknown table '{table}', expected one of: {', '.join(EXPORT_COLUMNS)}"}
+    if format not in EXPORT_FORMATS:
+        return 400, {"error": f"Unknown format '{format}', expected one of: {', '.join(EXPORT_FORMATS)}"}
+    if format == 'parquet' and not HAS_PYARROW:
+        return 400, {"error": "pyarrow package is missing. Run: pip install pyarrow"}
+
+    start_date, end_date = get_date_range(start, end)
+    content_type, encode = EXPORT_FORMATS[format]
+    chunks = encode(table, export_rows(table, start_date, end_date, source=source))
+    if isinstance(request, ASGIRequest):
+        chunks = aiter_chunks(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    last_day = end_date - timedelta(days=1)
+    response["Content-Disposition"] = f'attachment; filename="{table}_{start_date:%Y%m%d}_{last_day:%Y%m%d}.{format}"'
+    return response
@@ -1,6 +1,13 @@
 from ninja import Router, Schema
 from typing import List, Optional
-from .models import Category, Product
+import hashlib
+import json
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified
+from django.db.models import Max
+from .models import Category, Product, CatalogChange
+from .images import build_srcset
 
 router = Router()
 
@@ -8,6 +15,8 @@ class CategorySchema(Schema):
     id: int
     name: str
     icon_url: Optional[str] = None
+    icon_srcset: Optional[str] = None
+    icon_srcset_avif: Optional[str] = None
     sort_order: int
 
     @staticmethod
@@ -16,6 +25,14 @@ class CategorySchema(Schema):
             return obj.icon.url
         return None
 
+    @staticmethod
+    def resolve_icon_srcset(obj):
+        return build_srcset(obj.icon_variants, "webp")
+
+    @staticmethod
+    def resolve_icon_srcset_avif(obj):
+        return build_srcset(obj.icon_variants, "avif")
+
 class ProductSchema(Schema):
     id: int
     category_id: int
@@ -23,6 +40,8 @@ class ProductSchema(Schema):
     price: int
     description: str = ""
     image_url: Optional[str] = None
+    image_srcset: Optional[str] = None
+    image_srcset_avif: Optional[str] = None
     active: bool
 
     @staticmethod
@@ -31,6 +50,14 @@ class ProductSchema(Schema):
             return obj.image.url
         return None
 
+    @staticmethod
+    def resolve_image_srcset(obj):
+        return build_srcset(obj.image_variants, "webp")
+
+    @staticmethod
+    def resolve_image_srcset_avif(obj):
+        return build_srcset(obj.image_variants, "avif")
+
 @router.get("/categories", response=List[CategorySchema])
 def list_categories(request):
     return Category.objects.all()
@@ -41,3 +68,85 @@ def list_products(request, category_id: Optional[int] = None):
     if category_id:
         qs = qs.filter(category_id=category_id)
     return qs
+
+class CatalogSchema(Schema):
+    version: int
+    categories: List[CategorySchema]
+    products: List[ProductSchema]
+
+def current_catalog_version() -> int:
+    return CatalogChange.objects.aggregate(v=Max('id'))['v'] or 0
+
+# Entries are keyed by catalog version, which every worker reads from the
+# database, so an edit is visible everywhere as soon as it commits. The TTL
+# only bounds how long superseded versions linger in the cache.
+CATALOG_CACHE_KEY = "store:catalog:{}"
+CATALOG_CACHE_TTL = 60 * 60
+
+def invalidate_catalog():
+    # A change that commits after a higher id leaves the version unchanged, so drop its entry too
+    cache.delete(CATALOG_CACHE_KEY.format(current_catalog_version()))
+
+def get_catalog():
+    """
+    Returns (etag, json_bytes) for the full kiosk menu. The serialized body is
+    cached per catalog version (see store.signals for what bumps it).
+    """
+    # Version is read first: an edit racing the build is re-sent, never missed
+    version = current_catalog_version()
+    key = CATALOG_CACHE_KEY.format(version)
+    cached = cache.get(key)
+    if cached is None:
+        catalog = CatalogSchema(
+            version=version,
+            categories=list(Category.objects.all()),
+            products=list(Product.objects.filter(active=True))
+        )
+        body = json.dumps(catalog.dict(), cls=DjangoJSONEncoder).encode("utf-8")
+        cached = (f'"{hashlib.md5(body).hexdigest()}"', body)
+        cache.set(key, cached, CATALOG_CACHE_TTL)
+    return cached
+
+@router.get("/catalog", response=CatalogSchema)
+def get_full_catalog(request):
+    etag, body = get_catalog()
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"  # Always revalidate; unchanged menus cost a 304
+    return response
+
+class CatalogChangesSchema(Schema):
+    version: int
+    categories: List[CategorySchema]
+    products: List[ProductSchema]
+    deleted_categories: List[int]
+    deleted_products: List[int]
+
+@router.get("/catalog/changes", response=CatalogChangesSchema)
+def get_catalog_changes(request, since: int = 0):
+    """
+    Rows changed after catalog version `since`. Every entry is the row's
+    current state keyed by id, so clients apply repeats idempotently. Deleted
+    categories, and products that were deleted or deactivated, come back as
+    ids only.
+    """
+    version = current_catalog_version()
+    changed = CatalogChange.objects.filter(id__gt=since, id__lte=version).values_list('kind', 'object_id').distinct()
+
+    category_ids, product_ids = set(), set()
+    for kind, object_id in changed:
+        (category_ids if kind == 'CATEGORY' else product_ids).add(object_id)
+
+    categories = list(Category.objects.filter(id__in=category_ids)) if category_ids else []
+    products = list(Product.objects.filter(id__in=product_ids, active=True)) if product_ids else []
+
+    return {
+        "version": version,
+        "categories": categories,
+        "products": products,
+        "deleted_categories": sorted(category_ids - {c.id for c in categories}),
+        "deleted_products": sorted(product_ids - {p.id for p in products}),
+    }
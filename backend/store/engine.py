@@ -0,0 +1,325 @@
+import threading
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from store.models import Receipt, ReceiptItem
+from store.rollups import rollup_version, WEEKDAY_NAMES
+
+# Receipt ids below the high-water mark that are re-read on every refresh, so a
+# transaction committing out of id order is still picked up
+HWM_OVERLAP = 1000
+LOAD_CHUNK_SIZE = 20000
+
+SOURCE_CODES = {'REAL': 0, 'SIMULATED': 1}
+
+RECEIPT_FIELDS = ('id', 'created_at', 'source', 'total_items', 'total_amount')
+ITEM_FIELDS = ('receipt_id', 'created_at', 'receipt__source', 'product_id', 'category_id',
+               'product_name_snapshot', 'category_snapshot', 'qty', 'line_total')
+
+RECEIPT_COLUMNS = ('r_id', 'r_ts', 'r_source', 'r_items', 'r_cents')
+ITEM_COLUMNS = ('i_receipt', 'i_ts', 'i_source', 'i_product', 'i_category',
+                'i_name', 'i_catname', 'i_qty', 'i_cents')
+COLUMN_DTYPES = dict(zip(RECEIPT_COLUMNS + ITEM_COLUMNS, (
+    np.int64, np.int64, np.int8, np.int32, np.int64,
+    np.int64, np.int64, np.int8, np.int32, np.int32, np.int32, np.int32, np.int32, np.int64,
+)))
+
+def engine_enabled() -> bool:
+    return getattr(settings, 'ANALYTICS_ENGINE', 'rollup') == 'columnar'
+
+def _epoch(dt) -> int:
+    return int(dt.timestamp())
+
+
+class SalesColumns:
+    """
+    One immutable generation of the columnar sales data: int64 epoch seconds,
+    int8 source, int32 product/category ids and name codes, int64 cents.
+    Readers keep the object they were handed, so a refresh in another thread
+    never mixes old and new columns under them.
+    """
+
+    def __init__(self, names=(), **columns):
+        self.names = tuple(names)
+        for attr, dtype in COLUMN_DTYPES.items():
+            setattr(self, attr, columns.get(attr, np.empty(0, dtype)))
+
+    # --- Helpers ---
+
+    @staticmethod
+    def _local(ts):
+        """Epoch seconds as wall-clock seconds in the active timezone."""
+        tz = timezone.get_current_timezone()
+        if str(tz) == 'UTC':
+            return ts
+        local = pd.to_datetime(ts, unit='s', utc=True).tz_convert(tz).tz_localize(None)
+        return local.values.astype('datetime64[s]').astype(np.int64)
+
+    def _receipt_mask(self, start, end, source):
+        mask = (self.r_ts >= _epoch(start)) & (self.r_ts < _epoch(end))
+        if source:
+            mask &= self.r_source == SOURCE_CODES.get(source, -2)
+        return mask
+
+    def _item_mask(self, start, end, source, category_id=None, product_id=None):
+        mask = (self.i_ts >= _epoch(start)) & (self.i_ts < _epoch(end))
+        if source:
+            mask &= self.i_source == SOURCE_CODES.get(source, -2)
+        if category_id:
+            mask &= self.i_category == category_id
+        if product_id:
+            mask &= self.i_product == product_id
+        return mask
+
+    @staticmethod
+    def _distinct_receipts(receipts, *keys):
+        """Keeps one entry per receipt; all lines of a receipt share its timestamp."""
+        _, first = np.unique(receipts, return_index=True)
+        return [key[first] for key in keys]
+
+    # --- Calculations (same shapes as store.analytics_api) ---
+
+    def kpi(self, start, end, source=None):
+        m = self._receipt_mask(start, end, source)
+        orders = int(m.sum())
+        cents = int(self.r_cents[m].sum())
+        items = int(self.r_items[m].sum())
+        return {
+            "total_revenue": float(cents),
+            "total_orders": orders,
+            "avg_order_value": cents / orders if orders else 0.0,
+            "avg_items_per_order": items / orders if orders else 0.0,
+        }
+
+    def daily(self, start, end, source=None):
+        m = self._receipt_mask(start, end, source)
+        days, inverse = np.unique(self._local(self.r_ts[m]) // 86400, return_inverse=True)
+        orders = np.bincount(inverse, minlength=days.size)
+        revenue = np.bincount(inverse, weights=self.r_cents[m], minlength=days.size)
+        return [
+            {"date": str(np.datetime64(int(d), 'D')), "orders": int(o), "revenue": float(r)}
+            for d, o, r in zip(days, orders, revenue)
+        ]
+
+    def hourly(self, start, end, source=None):
+        m = self._receipt_mask(start, end, source)
+        hours = self._local(self.r_ts[m]) % 86400 // 3600
+        orders = np.bincount(hours, minlength=24)
+        revenue = np.bincount(hours, weights=self.r_cents[m], minlength=24)
+        return [{"hour": h, "orders": int(orders[h]), "revenue": float(revenue[h])} for h in range(7, 18)]
+
+    def top_products(self, start, end, limit=10, source=None):
+        m = self._item_mask(start, end, source)
+        names = self.i_name[m]
+        size = len(self.names)
+        lines = np.bincount(names, minlength=size)
+        qty = np.bincount(names, weights=self.i_qty[m], minlength=size)
+        revenue = np.bincount(names, weights=self.i_cents[m], minlength=size)
+        sold = np.flatnonzero(lines)
+        top = sold[np.argsort(-qty[sold], kind='stable')][:limit]
+        return [
+            {"product_name": self.names[c], "qty": int(qty[c]), "revenue": float(revenue[c])}
+            for c in top
+        ]
+
+    def timeseries(self, metric, freq, start, end, category_id=None, product_id=None, source=None):
+        # 1. Selected rows: line items under a category/product filter, receipts otherwise
+        if category_id or product_id:
+            m = self._item_mask(start, end, source, category_id, product_id)
+            ts, receipts = self.i_ts[m], self.i_receipt[m]
+            if metric == 'orders':
+                (ts,) = self._distinct_receipts(receipts, ts)
+                values = np.ones(ts.size)
+            else:
+                values = (self.i_qty if metric == 'quantity' else self.i_cents)[m]
+        else:
+            m = self._receipt_mask(start, end, source)
+            ts = self.r_ts[m]
+            if metric == 'orders':
+                values = np.ones(ts.size)
+            else:
+                values = (self.r_items if metric == 'quantity' else self.r_cents)[m]
+
+        # 2. Vectorised group-bys
+        local = self._local(ts)
+        day = local // 86400
+        if freq == 'H':
+            keys = local // 3600 * 3600
+        elif freq == 'W':
+            keys = day - (day + 3) % 7  # Monday of the week; 1970-01-01 was a Thursday
+        else:
+            keys = day
+
+        buckets, inverse = np.unique(keys, return_inverse=True)
+        totals = np.bincount(inverse, weights=values, minlength=buckets.size)
+
+        if freq == 'H':
+            labels = [str(np.datetime64(int(k), 's'))[:13].replace('T', ' ') + ':00' for k in buckets]
+        else:
+            labels = [str(np.datetime64(int(k), 'D')) for k in buckets]
+        series_data = [{"ds": ds, "y": float(y)} for ds, y in zip(labels, totals)]
+        y_values = totals.tolist()
+
+        if y_values:
+            summary = {
+                "total": float(sum(y_values)),
+                "avg": float(sum(y_values) / len(y_values)),
+                "min": float(min(y_values)),
+                "max": float(max(y_values)),
+            }
+        else:
+            summary = {"total": 0.0, "avg": 0.0, "min": 0.0, "max": 0.0}
+
+        unique_days = max((end - start).days, 1)
+        weeks_count = max(unique_days / 7.0, 1.0)
+
+        hours = local % 86400 // 3600
+        hour_rows = np.bincount(hours, minlength=24)
+        hour_tot = np.bincount(hours, weights=values, minlength=24)
+        weekdays = (day + 3) % 7
+        wd_rows = np.bincount(weekdays, minlength=7)
+        wd_tot = np.bincount(weekdays, weights=values, minlength=7)
+
+        # 3. Category totals over every line item in range
+        cm = self._item_mask(start, end, source)
+        catnames, receipts = self.i_catname[cm], self.i_receipt[cm]
+        if metric == 'orders':
+            pairs = np.unique(catnames.astype(np.int64) << 40 | receipts)
+            catnames, cat_values = (pairs >> 40).astype(np.int32), np.ones(pairs.size)
+        else:
+            cat_values = (self.i_qty if metric == 'quantity' else self.i_cents)[cm]
+        size = len(self.names)
+        cat_rows = np.bincount(catnames, minlength=size)
+        cat_tot = np.bincount(catnames, weights=cat_values, minlength=size)
+
+        breakdown = {
+            "weekday_avg": {WEEKDAY_NAMES[d]: round(float(wd_tot[d]) / weeks_count, 2) for d in np.flatnonzero(wd_rows)},
+            "hour_avg": {str(h): round(float(hour_tot[h]) / unique_days, 2) for h in np.flatnonzero(hour_rows)},
+            "category_tot": {self.names[c]: round(float(cat_tot[c]), 2) for c in np.flatnonzero(cat_rows) if self.names[c]},
+        }
+
+        return {"series": series_data, "summary": summary, "breakdown": breakdown}
+
+
+class SalesSnapshot:
+    """
+    Per-process loader for SalesColumns. New receipts are appended from a
+    high-water mark on Receipt.id; everything reloads when past hours are
+    rewritten (the rollup's history version moves). Each refresh builds a new
+    SalesColumns and publishes it with a single assignment.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, version):
+        self.version = version
+        self.hwm = 0
+        self.columns = SalesColumns()
+        # Dictionary encoding shared by product and category name snapshots
+        self.names = []
+        self._name_codes = {}
+
+    def _code(self, name) -> int:
+        code = self._name_codes.get(name)
+        if code is None:
+            code = self._name_codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    # --- Loading ---
+
+    def refresh(self) -> SalesColumns:
+        with self.lock:
+            version = rollup_version('history')
+            if version != self.version:
+                self._reset(version)
+
+            low = max(self.hwm - HWM_OVERLAP, 0)
+            known = self.columns.r_id[self.columns.r_id > low]
+
+            # One aggregate first: nothing above the mark and no late commit below it
+            seen = Receipt.objects.aggregate(top=Max('id'), count=Count('id', filter=Q(id__gt=low)))
+            if (seen['top'] or 0) <= self.hwm and seen['count'] == known.size:
+                return self.columns
+
+            receipts = self._load_receipts(low, known)
+            if receipts[0].size:
+                items = self._load_items(low, receipts[0])
+                old = self.columns
+                self.columns = SalesColumns(self.names, **{
+                    attr: np.concatenate([getattr(old, attr), col])
+                    for attr, col in zip(RECEIPT_COLUMNS + ITEM_COLUMNS, receipts + items)
+                })
+                self.hwm = max(self.hwm, int(receipts[0].max()))
+            return self.columns
+
+    def _load_receipts(self, low, known):
+        qs = Receipt.objects.filter(id__gt=low).order_by('id').values_list(*RECEIPT_FIELDS)
+        parts = []
+        chunk = []
+        for row in qs.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) >= LOAD_CHUNK_SIZE:
+                parts.append(self._receipt_columns(chunk))
+                chunk = []
+        if chunk:
+            parts.append(self._receipt_columns(chunk))
+        if not parts:
+            return tuple(np.empty(0, COLUMN_DTYPES[attr]) for attr in RECEIPT_COLUMNS)
+
+        columns = [np.concatenate(col) for col in zip(*parts)]
+        fresh = ~np.isin(columns[0], known)
+        return tuple(col[fresh] for col in columns)
+
+    def _receipt_columns(self, rows):
+        ids, created, source, items, amount = zip(*rows)
+        return (
+            np.array(ids, np.int64),
+            np.array([_epoch(dt) for dt in created], np.int64),
+            np.array([SOURCE_CODES.get(s, -1) for s in source], np.int8),
+            np.array(items, np.int32),
+            np.array(amount, np.int64),
+        )
+
+    def _load_items(self, low, new_ids):
+        qs = ReceiptItem.objects.filter(receipt_id__gt=low).order_by('id').values_list(*ITEM_FIELDS)
+        parts = []
+        chunk = []
+        for row in qs.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) >= LOAD_CHUNK_SIZE:
+                parts.append(self._item_columns(chunk))
+                chunk = []
+        if chunk:
+            parts.append(self._item_columns(chunk))
+        if not parts:
+            return tuple(np.empty(0, COLUMN_DTYPES[attr]) for attr in ITEM_COLUMNS)
+
+        columns = [np.concatenate(col) for col in zip(*parts)]
+        fresh = np.isin(columns[0], new_ids)
+        return tuple(col[fresh] for col in columns)
+
+    def _item_columns(self, rows):
+        receipt, created, source, product, category, name, catname, qty, total = zip(*rows)
+        return (
+            np.array(receipt, np.int64),
+            np.array([_epoch(dt) for dt in created], np.int64),
+            np.array([SOURCE_CODES.get(s, -1) for s in source], np.int8),
+            np.array([-1 if p is None else p for p in product], np.int32),
+            np.array([-1 if c is None else c for c in category], np.int32),
+            np.array([self._code(n or '') for n in name], np.int32),
+            np.array([self._code(c or '') for c in catname], np.int32),
+            np.array(qty, np.int32),
+            np.array(total, np.int64),
+        )
+
+
+_snapshot = SalesSnapshot()
+
+def get_snapshot() -> SalesColumns:
+    """The process-wide columns, brought up to date with committed receipts."""
+    return _snapshot.refresh()
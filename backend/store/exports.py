@@ -0,0 +1,135 @@
+import csv
+import io
+from asgiref.sync import sync_to_async
+from store.models import Receipt, ReceiptItem
+
+# Optional Parquet support
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Rows fetched per database round trip and written per CSV block / Parquet row group
+EXPORT_CHUNK_SIZE = 5000
+
+# (column name, queryset field) per exportable table; money columns are integer cents
+EXPORT_COLUMNS = {
+    'receipts': [
+        ('receipt_id', 'receipt_id'),
+        ('created_at', 'created_at'),
+        ('source', 'source'),
+        ('total_items', 'total_items'),
+        ('total_amount', 'total_amount'),
+    ],
+    'items': [
+        ('receipt_id', 'receipt__receipt_id'),
+        ('created_at', 'created_at'),
+        ('source', 'receipt__source'),
+        ('product_id', 'product_id'),
+        ('product_name', 'product_name_snapshot'),
+        ('category_id', 'category_id'),
+        ('category', 'category_snapshot'),
+        ('qty', 'qty'),
+        ('unit_price', 'unit_price'),
+        ('line_total', 'line_total'),
+    ],
+}
+
+def _parquet_schema(table: str):
+    money = pa.int64()
+    types = {
+        'receipt_id': pa.string(),
+        'created_at': pa.timestamp('us', tz='UTC'),
+        'source': pa.string(),
+        'total_items': pa.int32(),
+        'total_amount': money,
+        'product_id': pa.int64(),
+        'product_name': pa.string(),
+        'category_id': pa.int64(),
+        'category': pa.string(),
+        'qty': pa.int32(),
+        'unit_price': money,
+        'line_total': money,
+    }
+    return pa.schema([(name, types[name]) for name, _ in EXPORT_COLUMNS[table]])
+
+def export_rows(table: str, start, end, source=None, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yields lists of up to chunk_size value tuples, streamed with a server-side cursor."""
+    model = Receipt if table == 'receipts' else ReceiptItem
+    qs = model.objects.filter(created_at__gte=start, created_at__lt=end)
+    if source:
+        qs = qs.filter(source=source) if model is Receipt else qs.filter(receipt__source=source)
+
+    fields = [field for _, field in EXPORT_COLUMNS[table]]
+    chunk = []
+    for row in qs.order_by('created_at', 'id').values_list(*fields).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_csv(table: str, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in EXPORT_COLUMNS[table]])
+    for chunk in rows:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain()."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+def iter_parquet(table: str, rows):
+    schema = _parquet_schema(table)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for chunk in rows:
+        columns = list(zip(*chunk))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        ))
+        yield sink.drain()  # One finished row group
+    writer.close()
+    yield sink.drain()  # Footer (and the header if nothing was written)
+
+async def aiter_chunks(chunks):
+    """
+    Serves a blocking chunk iterator to an ASGI response one chunk at a time.
+    Django would otherwise read a sync iterator to the end before sending.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            break
+        yield chunk
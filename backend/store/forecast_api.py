@@ -7,6 +7,7 @@ router = Router()
 class FiltersSchema(Schema):
     category_id: Optional[int] = None
     product_id: Optional[int] = None
+    source: Optional[str] = None # "REAL" or "SIMULATED"
 
 class CVSchema(Schema):
     type: str = "rolling"
@@ -2,10 +2,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from django.utils import timezone
-from django.db.models import Sum, Count
+from django.db.models import Sum
 from django.db.models.functions import TruncDate, TruncHour, TruncWeek
-from store.models import Receipt, ReceiptItem
 from store.analytics_api import get_date_range
+from store.rollups import rollup_queryset, ROLLUP_METRICS
 
 # Optional Machine Learning Imports
 try:
@@ -29,28 +29,19 @@ except ImportError:
 
 def load_series(metric='revenue', freq='D', start=None, end=None, filters=None):
     """
-    Loads historical receipt data and returns a pandas Series indexed by datetime.
+    Loads historical sales from the hourly rollup and returns a pandas Series indexed by datetime.
     freq: 'H' (hourly), 'D' (daily), 'W' (weekly)
     """
     start_date, end_date = get_date_range(start, end)
     
-    if filters and ('category_id' in filters or 'product_id' in filters):
-        qs = ReceiptItem.objects.filter(receipt__created_at__range=(start_date, end_date))
-        if 'category_id' in filters:
-            qs = qs.filter(product__category_id=filters['category_id'])
-        if 'product_id' in filters:
-            qs = qs.filter(product_id=filters['product_id'])
-        date_field = 'receipt__created_at'
-        revenue_field = 'line_total'
-    elif metric == 'quantity':
-        # Even without filters, we need ReceiptItem to sum quantities of individual items
-        qs = ReceiptItem.objects.filter(receipt__created_at__range=(start_date, end_date))
-        date_field = 'receipt__created_at'
-        revenue_field = 'line_total'  # Unused for quantity, but kept for consistency
-    else:
-        qs = Receipt.objects.filter(created_at__range=(start_date, end_date))
-        date_field = 'created_at'
-        revenue_field = 'total_amount'
+    filters = filters or {}
+    qs = rollup_queryset(
+        start_date, end_date,
+        category_id=filters.get('category_id'),
+        product_id=filters.get('product_id'),
+        source=filters.get('source')
+    )
+    date_field = 'hour'
 
     if freq == 'H':
         trunc_func = TruncHour(date_field)
@@ -62,15 +53,7 @@ def load_series(metric='revenue', freq='D', start=None, end=None, filters=None):
         trunc_func = TruncDate(date_field)
         resample_rule = 'D'
 
-    if metric == 'orders':
-        if filters and ('category_id' in filters or 'product_id' in filters):
-            agg_expr = Count('receipt', distinct=True)
-        else:
-            agg_expr = Count('id')
-    elif metric == 'quantity':
-        agg_expr = Sum('qty')
-    else:
-        agg_expr = Sum(revenue_field)
+    agg_expr = Sum(ROLLUP_METRICS.get(metric, 'revenue'))
 
     data = (
         qs.annotate(ds=trunc_func)
@@ -82,10 +65,7 @@ def load_series(metric='revenue', freq='D', start=None, end=None, filters=None):
     records = []
     for row in data:
         if row['ds']:
-            val = float(row['y'] or 0)
-            if metric == 'revenue':
-                val *= 100 # Convert to integer cents
-            records.append({'ds': row['ds'], 'y': val})
+            records.append({'ds': row['ds'], 'y': float(row['y'] or 0)})
 
     if not records:
         return pd.Series(dtype=float)
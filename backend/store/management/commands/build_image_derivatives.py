@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from store.models import Category, Product
+from store.images import build_image_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Builds responsive image derivatives for existing product and category images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild even if derivatives are up to date')
+
+    def handle(self, *args, **options):
+        built = 0
+        for model, field_name, variants_name in (
+            (Category, 'icon', 'icon_variants'),
+            (Product, 'image', 'image_variants'),
+        ):
+            for obj in model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}):
+                image = getattr(obj, field_name)
+                current = getattr(obj, variants_name)
+                if not options['force'] and current and current.get('source') == image.name:
+                    continue
+                try:
+                    variants = build_image_derivatives(image)
+                except (OSError, ValueError) as e:
+                    self.stderr.write(f"Skipping {image.name}: {e}")
+                    continue
+                # Saving records a CatalogChange so delta-syncing kiosks pick it up
+                setattr(obj, variants_name, variants)
+                obj.save(update_fields=[variants_name])
+                built += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {built} images."))
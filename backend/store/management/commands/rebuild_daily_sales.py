@@ -0,0 +1,36 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from django.db.models import Min, Max
+from django.utils import timezone
+from store.models import Receipt, DailySales
+from store.rollups import refresh_daily_sales
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the DailySales KPI table from raw receipts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First day to rebuild (YYYY-MM-DD), defaults to the oldest receipt')
+        parser.add_argument('--end', type=str, help='Last day to rebuild (YYYY-MM-DD), defaults to the newest receipt')
+        parser.add_argument('--if-empty', action='store_true', help='Only rebuild when the table has no rows yet')
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and DailySales.objects.exists():
+            self.stdout.write("Daily sales table already populated, skipping.")
+            return
+
+        span = Receipt.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+        first_day = timezone.localdate(span['first']) if span['first'] else None
+        last_day = timezone.localdate(span['last']) if span['last'] else None
+        if options['start']:
+            first_day = datetime.strptime(options['start'], "%Y-%m-%d").date()
+        if options['end']:
+            last_day = datetime.strptime(options['end'], "%Y-%m-%d").date()
+        if first_day is None or last_day is None:
+            self.stdout.write("No receipts to summarise.")
+            return
+
+        refresh_daily_sales(first_day, last_day)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt daily sales from {first_day:%Y-%m-%d} to {last_day:%Y-%m-%d}."
+        ))
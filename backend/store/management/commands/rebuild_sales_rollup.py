@@ -0,0 +1,34 @@
+from datetime import datetime, timezone as dt_timezone
+from django.core.management.base import BaseCommand
+from django.db.models import Min, Max
+from store.models import Receipt, HourlySales
+from store.rollups import refresh_sales_rollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the HourlySales rollup from raw receipts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First day to rebuild (YYYY-MM-DD), defaults to the oldest receipt')
+        parser.add_argument('--end', type=str, help='Last day to rebuild (YYYY-MM-DD), defaults to the newest receipt')
+        parser.add_argument('--if-empty', action='store_true', help='Only rebuild when the rollup has no rows yet')
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and HourlySales.objects.exists():
+            self.stdout.write("Hourly sales rollup already populated, skipping.")
+            return
+
+        span = Receipt.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+        start, end = span['first'], span['last']
+        if options['start']:
+            start = datetime.strptime(options['start'], "%Y-%m-%d").replace(tzinfo=dt_timezone.utc)
+        if options['end']:
+            end = datetime.strptime(options['end'], "%Y-%m-%d").replace(hour=23, tzinfo=dt_timezone.utc)
+        if start is None or end is None:
+            self.stdout.write("No receipts to roll up.")
+            return
+
+        refresh_sales_rollup(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt hourly sales rollup from {start:%Y-%m-%d %H:00} to {end:%Y-%m-%d %H:00}."
+        ))
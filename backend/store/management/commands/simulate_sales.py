@@ -1,16 +1,30 @@
 import os
 import csv
-import uuid
-import math
-import random
-from datetime import datetime, timedelta, time, timezone as dt_timezone
-from decimal import Decimal
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
 from django.utils import timezone
 from store.models import Receipt, ReceiptItem, Product
+from store.rollups import refresh_sales_rollup
+from store.simulation import HOURS, product_weight, simulate_day
+
+# Receipts generated before each insert round trip (a couple of weeks of sales),
+# bounds memory however long the simulated range is
+INSERT_CHUNK_SIZE = 2000
+BATCH_SIZE = 500
+DELETE_WINDOW = timedelta(days=31)
+
+CSV_HEADERS = {
+    'transactions.csv': ['transaction_id', 'date', 'hour', 'product_name', 'category', 'qty', 'unit_price', 'line_total'],
+    'receipts.csv': ['receipt_id', 'date', 'hour', 'total_items', 'total_amount', 'source'],
+    'hourly_sales.csv': ['date', 'hour', 'total_receipts', 'total_amount'],
+    'daily_sales.csv': ['date', 'total_receipts', 'total_amount'],
+}
 
 class Command(BaseCommand):
     help = 'Simulates realistic sales data and exports to CSV.'
@@ -29,7 +43,8 @@ class Command(BaseCommand):
         outdir_name = options['outdir']
         reset_sim_flag = options['reset_simulated']
         
-        random.seed(seed)
+        # One seeded Generator drives every draw, so a seed always replays the same sales
+        rng = np.random.default_rng(seed)
         
         # Use simple UTC timezone to avoid timezone tracking issues with dummy data
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d").replace(tzinfo=dt_timezone.utc)
@@ -37,10 +52,17 @@ class Command(BaseCommand):
         
         if reset_sim_flag:
             self.stdout.write(f"Deleting existing SIMULATED receipts from {start_date_str} to {end_date_str}...")
-            deleted, _ = Receipt.objects.filter(
-                source='SIMULATED',
-                created_at__range=(start_date, end_date + timedelta(days=1))
-            ).delete()
+            # One window at a time, delete() loads the receipts it cascades from
+            deleted = 0
+            window_start = start_date
+            while window_start <= end_date:
+                window_end = min(window_start + DELETE_WINDOW, end_date + timedelta(days=1))
+                deleted += Receipt.objects.filter(
+                    source='SIMULATED',
+                    created_at__gte=window_start,
+                    created_at__lt=window_end
+                ).delete()[1].get('store.Receipt', 0)
+                window_start = window_end
             self.stdout.write(f"Deleted {deleted} SIMULATED receipts.")
             
         products = list(Product.objects.select_related('category').filter(active=True))
@@ -48,226 +70,163 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR("No active products found in DB. Please run seed script first."))
             return
             
-        # Product weights calculation
-        product_weights = []
-        for p in products:
-            cat_name = p.category.name.lower()
-            if 'signature' in cat_name:
-                w = 2.0
-            elif 'sparking' in cat_name or 'smoothie' in cat_name:
-                w = 1.5
-            elif 'matcha' in cat_name:
-                w = 1.2
-            elif 'weird' in cat_name:
-                w = 0.5
-            else:
-                w = 1.0
-            product_weights.append(w)
+        prices = [p.price for p in products]
+        weights = np.array([product_weight(p.category.name) for p in products])
+        product_probs = weights / weights.sum()
             
         total_days = (end_date - start_date).days
         if total_days < 0:
             self.stdout.write(self.style.ERROR("Start date must be before end date."))
             return
             
-        # Intraday weights (07:00 - 18:00)
-        intraday_weights_dict = {
-            7: 0.5, 8: 1.0, 9: 0.8, 10: 0.7, 11: 0.6,
-            12: 1.2, 13: 0.9, 14: 0.8, 15: 1.0, 16: 0.8, 17: 0.6
-        }
-        total_intraday_weight = sum(intraday_weights_dict.values())
-        intraday_probs = {h: w / total_intraday_weight for h, w in intraday_weights_dict.items()}
-        hours = list(intraday_probs.keys())
-        probs = list(intraday_probs.values())
-        
-        seasonal_multipliers = {
-            1: 1.0, 2: 1.0, 3: 1.1, 4: 1.2, 5: 1.15, 6: 0.9,
-            7: 0.85, 8: 0.85, 9: 0.8, 10: 0.9, 11: 1.0, 12: 1.05
-        }
-        weekday_multipliers = [1.1, 0.9, 0.9, 1.0, 1.15, 1.0, 0.9] # Mon=0 ... Sun=6
-        
         def iter_days(start, end):
             curr = start
             while curr <= end:
                 yield curr
                 curr += timedelta(days=1)
                 
-        receipts_to_create = []
+        # Export CSVs as we go
+        out_path = os.path.join(settings.BASE_DIR, outdir_name)
+        os.makedirs(out_path, exist_ok=True)
         
-        daily_stats = []
-        hourly_stats = []
-        transactions_csv = []
-        receipts_csv = []
+        self.stdout.write(f"Simulating sales data into the database and {out_path}...")
         
-        self.stdout.write("Simulating sales data...")
+        inserted_receipts = 0
+        inserted_items = 0
         
-        for day_index, current_date in enumerate(iter_days(start_date, end_date)):
-            # Growth trend: logistic curve from ~65 to ~170
-            L = 170.0 - 65.0
-            k = 0.05
-            x0 = total_days / 2.0
-            trend_base = 65.0 + L / (1.0 + math.exp(-k * (day_index - x0)))
-            
-            # Apply multipliers
-            wk_mult = weekday_multipliers[current_date.weekday()]
-            seas_mult = seasonal_multipliers[current_date.month]
-            
-            expected_orders = trend_base * wk_mult * seas_mult
-            
-            # Add random noise (+/- 15%)
-            noise = random.uniform(0.85, 1.15)
-            daily_orders = int(round(expected_orders * noise))
+        with ExitStack() as files:
+            writers = {}
+            for name, header in CSV_HEADERS.items():
+                f = files.enter_context(open(os.path.join(out_path, name), 'w', newline='', encoding='utf-8'))
+                writers[name] = csv.writer(f)
+                writers[name].writerow(header)
             
-            day_total_amount = Decimal('0.00')
+            # Receipts (with their lines) waiting for the next insert round trip,
+            # and the first day they cover
+            pending = []
+            chunk_start = start_date
             
-            hour_assignments = random.choices(hours, weights=probs, k=daily_orders)
-            
-            hour_counts = {h: 0 for h in hours}
-            for h in hour_assignments:
-                hour_counts[h] += 1
-                
-            for h in hours:
-                orders_this_hour = hour_counts[h]
-                hr_total_amount = Decimal('0.00')
+            for day_index, current_date in enumerate(iter_days(start_date, end_date)):
+                day = simulate_day(rng, current_date, day_index, total_days, prices, product_probs)
+                pending.extend(self.build_day(current_date, day, products, writers))
                 
-                for _ in range(orders_this_hour):
-                    minute = random.randint(0, 59)
-                    second = random.randint(0, 59)
-                    order_time = current_date.replace(hour=h, minute=minute, second=second)
-                    
-                    receipt_id = f"REC-{order_time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6].upper()}"
-                    
-                    num_items = random.choices([1, 2, 3], weights=[0.65, 0.28, 0.07], k=1)[0]
-                    selected_products = random.choices(products, weights=product_weights, k=num_items)
-                    
-                    order_total_items = 0
-                    order_total_amount = Decimal('0.00')
-                    
-                    receipt_obj = Receipt(
-                        receipt_id=receipt_id,
-                        created_at=order_time,
-                        total_items=0,
-                        total_amount=Decimal('0.00'),
-                        source='SIMULATED'
-                    )
-                    
-                    order_items_objs = []
-                    
-                    for prod in selected_products:
-                        qty = random.choices([1, 2], weights=[0.9, 0.1], k=1)[0]
-                        unit_price = Decimal(prod.price) / Decimal('100.00')
-                        line_total = unit_price * qty
-                        
-                        order_total_items += qty
-                        order_total_amount += line_total
-                        
-                        item_obj = ReceiptItem(
-                            receipt=receipt_obj, # Assign temporarily
-                            product=prod,
-                            product_name_snapshot=prod.name,
-                            category_snapshot=prod.category.name,
-                            qty=qty,
-                            unit_price=unit_price,
-                            line_total=line_total
-                        )
-                        order_items_objs.append(item_obj)
-                        
-                        transactions_csv.append({
-                            'transaction_id': receipt_id,
-                            'date': current_date.strftime('%Y-%m-%d'),
-                            'hour': f"{h:02d}:00",
-                            'product_name': prod.name,
-                            'category': prod.category.name,
-                            'qty': qty,
-                            'unit_price': unit_price,
-                            'line_total': line_total
-                        })
-                        
-                    receipt_obj.total_items = order_total_items
-                    receipt_obj.total_amount = order_total_amount
-                    
-                    receipts_to_create.append((receipt_obj, order_items_objs))
-                    
-                    receipts_csv.append({
-                        'receipt_id': receipt_id,
-                        'date': current_date.strftime('%Y-%m-%d'),
-                        'hour': f"{h:02d}:00",
-                        'total_items': order_total_items,
-                        'total_amount': order_total_amount,
-                        'source': 'SIMULATED'
-                    })
-                    
-                    hr_total_amount += order_total_amount
-                    
-                hourly_stats.append({
-                    'date': current_date.strftime('%Y-%m-%d'),
-                    'hour': f"{h:02d}:00",
-                    'total_receipts': orders_this_hour,
-                    'total_amount': hr_total_amount
-                })
-                day_total_amount += hr_total_amount
+                if len(pending) >= INSERT_CHUNK_SIZE:
+                    receipts, items = self.insert_chunk(pending)
+                    inserted_receipts += receipts
+                    inserted_items += items
+                    # Whole days per chunk, so the refreshed spans tile the range
+                    refresh_sales_rollup(chunk_start, current_date.replace(hour=23))
+                    pending = []
+                    chunk_start = current_date + timedelta(days=1)
                 
-            daily_stats.append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'total_receipts': daily_orders,
-                'total_amount': day_total_amount
-            })
-
-            # Progress output
-            if day_index % 30 == 0:
-                self.stdout.write(f"Processed up to {current_date.strftime('%Y-%m-%d')}...")
-
-        self.stdout.write("Bulk inserting data into database...")
-        
-        BATCH_SIZE = 500
-        
-        all_receipts = [r[0] for r in receipts_to_create]
-        Receipt.objects.bulk_create(all_receipts, batch_size=BATCH_SIZE, ignore_conflicts=True)
-        
-        # Now fetch the created receipts to get exact PKs
-        all_receipt_ids = [r.receipt_id for r in all_receipts]
-        
-        db_receipts = {}
-        for i in range(0, len(all_receipt_ids), BATCH_SIZE):
-            chunk = all_receipt_ids[i:i+BATCH_SIZE]
-            qs = Receipt.objects.filter(receipt_id__in=chunk).values_list('receipt_id', 'id')
-            db_receipts.update(dict(qs))
+                # Progress output
+                if day_index % 30 == 0:
+                    self.stdout.write(f"Processed up to {current_date.strftime('%Y-%m-%d')}...")
             
-        final_items_to_insert = []
-        for r_obj, items in receipts_to_create:
-            r_pk = db_receipts.get(r_obj.receipt_id)
-            if r_pk:
-                for item in items:
-                    item.receipt_id = r_pk  # Use the hidden integer identifier to avoid lookup overhead
-                    final_items_to_insert.append(item)
-                    
-        ReceiptItem.objects.bulk_create(final_items_to_insert, batch_size=BATCH_SIZE)
-        
-        self.stdout.write(self.style.SUCCESS(f"Inserted {len(all_receipts)} receipts and {len(final_items_to_insert)} items."))
+            receipts, items = self.insert_chunk(pending)
+            inserted_receipts += receipts
+            inserted_items += items
+            if chunk_start <= end_date:
+                refresh_sales_rollup(chunk_start, end_date.replace(hour=23))
         
-        # Export CSVs
-        out_path = os.path.join(settings.BASE_DIR, outdir_name)
-        os.makedirs(out_path, exist_ok=True)
-        
-        self.stdout.write(f"Exporting CSVs to {out_path}...")
-        
-        with open(os.path.join(out_path, 'transactions.csv'), 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['transaction_id', 'date', 'hour', 'product_name', 'category', 'qty', 'unit_price', 'line_total'])
-            writer.writeheader()
-            writer.writerows(transactions_csv)
-            
-        with open(os.path.join(out_path, 'receipts.csv'), 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['receipt_id', 'date', 'hour', 'total_items', 'total_amount', 'source'])
-            writer.writeheader()
-            writer.writerows(receipts_csv)
-            
-        with open(os.path.join(out_path, 'hourly_sales.csv'), 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['date', 'hour', 'total_receipts', 'total_amount'])
-            writer.writeheader()
-            writer.writerows(hourly_stats)
-            
-        with open(os.path.join(out_path, 'daily_sales.csv'), 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['date', 'total_receipts', 'total_amount'])
-            writer.writeheader()
-            writer.writerows(daily_stats)
+        self.stdout.write(self.style.SUCCESS(f"Inserted {inserted_receipts} receipts and {inserted_items} items."))
             
         self.stdout.write(self.style.SUCCESS('Data simulation and export completed successfully!'))
+
+    def build_day(self, current_date, day, products, writers):
+        """Turns one simulate_day result into unsaved receipts and lines, writing its CSV rows."""
+        date_str = current_date.strftime('%Y-%m-%d')
+        stamp = current_date.strftime('%Y%m%d')
+
+        # Receipts, then their lines, straight from the day's arrays
+        receipt_objs = []
+        hour_labels = []
+        receipt_rows = []
+        for seconds, suffix, total_items, total_amount in zip(
+            day['seconds'].tolist(), day['suffix'].tolist(),
+            day['total_items'].tolist(), day['total_amount'].tolist()
+        ):
+            h, rem = divmod(seconds, 3600)
+            receipt_id = f"REC-{stamp}{h:02d}{rem // 60:02d}{rem % 60:02d}-{suffix:06X}"
+            receipt_objs.append(Receipt(
+                receipt_id=receipt_id,
+                created_at=current_date + timedelta(seconds=seconds),
+                total_items=total_items,
+                total_amount=total_amount,
+                source='SIMULATED'
+            ))
+            hour_labels.append(f"{h:02d}:00")
+            receipt_rows.append((receipt_id, date_str, hour_labels[-1], total_items, total_amount, 'SIMULATED'))
+
+        item_lists = [[] for _ in receipt_objs]
+        transaction_rows = []
+        for r, p, qty, unit_price, line_total in zip(
+            day['receipt'].tolist(), day['product'].tolist(), day['qty'].tolist(),
+            day['unit_price'].tolist(), day['line_total'].tolist()
+        ):
+            receipt_obj = receipt_objs[r]
+            prod = products[p]
+            item_lists[r].append(ReceiptItem(
+                receipt=receipt_obj, # Gets its pk once the receipt is inserted
+                product=prod,
+                created_at=receipt_obj.created_at,
+                category_id=prod.category_id,
+                product_name_snapshot=prod.name,
+                category_snapshot=prod.category.name,
+                qty=qty,
+                unit_price=unit_price,
+                line_total=line_total
+            ))
+            transaction_rows.append((
+                receipt_obj.receipt_id, date_str, hour_labels[r],
+                prod.name, prod.category.name, qty, unit_price, line_total
+            ))
+
+        # Hour and day totals
+        hour_of_receipt = day['seconds'] // 3600
+        hour_orders = np.bincount(hour_of_receipt, minlength=24)
+        hour_amounts = np.bincount(hour_of_receipt, weights=day['total_amount'], minlength=24).astype(np.int64)
+
+        writers['transactions.csv'].writerows(transaction_rows)
+        writers['receipts.csv'].writerows(receipt_rows)
+        writers['hourly_sales.csv'].writerows(
+            (date_str, f"{h:02d}:00", int(hour_orders[h]), int(hour_amounts[h])) for h in HOURS.tolist()
+        )
+        writers['daily_sales.csv'].writerow((date_str, len(receipt_objs), int(day['total_amount'].sum())))
+
+        return list(zip(receipt_objs, item_lists))
+
+    def insert_chunk(self, entries):
+        """
+        Inserts (receipt, lines) pairs in one transaction and returns how many
+        receipts and lines were written. Primary keys come back from the
+        receipt INSERT where the backend supports RETURNING (Postgres, recent
+        SQLite), otherwise from one lookup per batch.
+        """
+        with transaction.atomic():
+            # A seed always yields the same receipt ids, so re-running a range without
+            # --reset-simulated must not attach a second set of lines to existing receipts
+            existing = set()
+            for i in range(0, len(entries), BATCH_SIZE):
+                chunk = [r.receipt_id for r, _ in entries[i:i+BATCH_SIZE]]
+                existing.update(Receipt.objects.filter(receipt_id__in=chunk).values_list('receipt_id', flat=True))
+            entries = [entry for entry in entries if entry[0].receipt_id not in existing]
+            receipts = [r for r, _ in entries]
+
+            Receipt.objects.bulk_create(receipts, batch_size=BATCH_SIZE)
+
+            if not connection.features.can_return_rows_from_bulk_insert:
+                for i in range(0, len(receipts), BATCH_SIZE):
+                    batch = receipts[i:i+BATCH_SIZE]
+                    pks = dict(Receipt.objects.filter(receipt_id__in=[r.receipt_id for r in batch]).values_list('receipt_id', 'id'))
+                    for r in batch:
+                        r.pk = pks[r.receipt_id]
+
+            items = []
+            for receipt, lines in entries:
+                for item in lines:
+                    item.receipt = receipt  # Re-assign so receipt_id picks up the new pk
+                    items.append(item)
+            ReceiptItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+
+        return len(receipts), len(items)
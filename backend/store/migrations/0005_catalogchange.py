@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:01
+
+from django.db import migrations, models
+
+
+def seed_catalog_changes(apps, schema_editor):
+    # Existing menu rows become version 1..N so `since=0` returns everything
+    Category = apps.get_model('store', 'Category')
+    Product = apps.get_model('store', 'Product')
+    CatalogChange = apps.get_model('store', 'CatalogChange')
+    CatalogChange.objects.bulk_create(
+        [CatalogChange(kind='CATEGORY', object_id=pk) for pk in Category.objects.values_list('id', flat=True)]
+        + [CatalogChange(kind='PRODUCT', object_id=pk) for pk in Product.objects.values_list('id', flat=True)]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_alter_receiptitem_category_snapshot_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('CATEGORY', 'Category'), ('PRODUCT', 'Product')], max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(seed_catalog_changes, migrations.RunPython.noop),
+    ]
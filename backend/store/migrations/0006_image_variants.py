@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_catalogchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='icon_variants',
+            field=models.JSONField(blank=True, editable=False, help_text='Derivatives built by store.images', null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, editable=False, help_text='Derivatives built by store.images', null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('TOTAL', 'Total'), ('CATEGORY', 'Category'), ('PRODUCT', 'Product')], max_length=10)),
+                ('hour', models.DateTimeField(help_text='Start of the hour bucket')),
+                ('source', models.CharField(choices=[('REAL', 'Real'), ('SIMULATED', 'Simulated')], max_length=20)),
+                ('category_name', models.CharField(blank=True, default='', max_length=255)),
+                ('product_name', models.CharField(blank=True, default='', max_length=255)),
+                ('orders', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('category', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='store.category')),
+                ('product', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='store.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Hourly sales',
+                'indexes': [models.Index(fields=['level', 'category', 'hour'], name='store_hourl_level_22a6cd_idx'), models.Index(fields=['level', 'product', 'hour'], name='store_hourl_level_28a3a1_idx')],
+                'constraints': [models.UniqueConstraint(fields=('level', 'hour', 'source', 'category_name', 'product_name'), name='hourly_sales_bucket')],
+            },
+        ),
+    ]
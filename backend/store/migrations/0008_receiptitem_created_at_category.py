@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_receipt_columns(apps, schema_editor):
+    # Existing lines take their receipt's timestamp and their product's category
+    Receipt = apps.get_model('store', 'Receipt')
+    ReceiptItem = apps.get_model('store', 'ReceiptItem')
+    Product = apps.get_model('store', 'Product')
+    ReceiptItem.objects.update(
+        created_at=Subquery(Receipt.objects.filter(id=OuterRef('receipt_id')).values('created_at')[:1]),
+        category_id=Subquery(Product.objects.filter(id=OuterRef('product_id')).values('category_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+    # The copy sets a deferred FK on every row; on Postgres its queued checks make a
+    # CREATE INDEX in the same transaction fail ("pending trigger events"). The copy
+    # gets its own transaction instead, committed before the indexes are built.
+    atomic = False
+
+    dependencies = [
+        ('store', '0007_hourlysales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receiptitem',
+            name='category',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='store.category'),
+        ),
+        migrations.AddField(
+            model_name='receiptitem',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_receipt_columns, migrations.RunPython.noop, atomic=True),
+        migrations.AddIndex(
+            model_name='receiptitem',
+            index=models.Index(fields=['created_at', 'product'], name='store_recei_created_d5dbe0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receiptitem',
+            index=models.Index(fields=['created_at', 'category'], name='store_recei_created_221e63_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_receiptitem_created_at_category'),
+    ]
+
+    operations = [
+        # New indexes first so range queries never run without one
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['source', 'created_at'], include=('total_amount', 'total_items'), name='receipt_source_created'),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['created_at'], include=('source', 'total_amount', 'total_items'), name='receipt_created'),
+        ),
+        migrations.AlterField(
+            model_name='receipt',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='receipt',
+            name='source',
+            field=models.CharField(choices=[('REAL', 'Real'), ('SIMULATED', 'Simulated')], default='SIMULATED', max_length=20),
+        ),
+    ]
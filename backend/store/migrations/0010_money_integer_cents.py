@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:19
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F
+from django.db.models.functions import Round
+
+# (model, field) pairs converted from Decimal dollars to integer cents
+MONEY_FIELDS = [
+    ('HourlySales', 'revenue'),
+    ('Receipt', 'total_amount'),
+    ('ReceiptItem', 'line_total'),
+    ('ReceiptItem', 'unit_price'),
+]
+
+
+def dollars_to_cents(apps, schema_editor):
+    # Scaled while still Decimal, so the column type change only drops the ".00"
+    for model_name, field in MONEY_FIELDS:
+        apps.get_model('store', model_name).objects.update(**{field: Round(F(field) * 100)})
+
+
+def cents_to_dollars(apps, schema_editor):
+    for model_name, field in MONEY_FIELDS:
+        # Float divisor, integer division would drop the cents on SQLite
+        dollars = ExpressionWrapper(F(field) / 100.0, output_field=models.DecimalField(max_digits=12, decimal_places=2))
+        apps.get_model('store', model_name).objects.update(**{field: dollars})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_receipt_source_created_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(dollars_to_cents, cents_to_dollars),
+        migrations.AlterField(
+            model_name='hourlysales',
+            name='revenue',
+            field=models.BigIntegerField(default=0, help_text='Revenue in cents'),
+        ),
+        migrations.AlterField(
+            model_name='receipt',
+            name='total_amount',
+            field=models.IntegerField(help_text='Total in cents'),
+        ),
+        migrations.AlterField(
+            model_name='receiptitem',
+            name='line_total',
+            field=models.IntegerField(help_text='Line total in cents'),
+        ),
+        migrations.AlterField(
+            model_name='receiptitem',
+            name='unit_price',
+            field=models.IntegerField(help_text='Price per unit in cents'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_money_integer_cents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Local date in TIME_ZONE')),
+                ('source', models.CharField(choices=[('REAL', 'Real'), ('SIMULATED', 'Simulated')], max_length=20)),
+                ('orders', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0, help_text='Revenue in cents')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily sales',
+                'constraints': [models.UniqueConstraint(fields=('day', 'source'), name='daily_sales_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_dailysales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupVersion',
+            fields=[
+                ('scope', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:54
+
+from django.db import migrations, models
+
+
+def create_lock_row(apps, schema_editor):
+    # Created up front so concurrent first edits lock it instead of racing to insert it
+    apps.get_model('store', 'CatalogLock').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_rollupversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.RunPython(create_lock_row, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,7 @@ from django.db import models
 class Category(models.Model):
     name = models.CharField(max_length=100)
     icon = models.ImageField(upload_to='categories/', null=True, blank=True)
+    icon_variants = models.JSONField(null=True, blank=True, editable=False, help_text="Derivatives built by store.images")
     sort_order = models.IntegerField(default=0)
 
     class Meta:
@@ -17,12 +18,35 @@ class Product(models.Model):
     name = models.CharField(max_length=200)
     price = models.IntegerField(help_text="Price in cents (e.g., 100 = $1.00)")
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    image_variants = models.JSONField(null=True, blank=True, editable=False, help_text="Derivatives built by store.images")
     active = models.BooleanField(default=True)
     description = models.TextField(blank=True)
 
     def __str__(self):
         return self.name
 
+class CatalogChange(models.Model):
+    """Append-only log of menu edits. The auto id doubles as the catalog version."""
+    KIND_CHOICES = [
+        ('CATEGORY', 'Category'),
+        ('PRODUCT', 'Product'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"v{self.id} {self.kind} #{self.object_id}"
+
+class CatalogLock(models.Model):
+    """
+    Single row locked (SELECT ... FOR UPDATE) while a CatalogChange is written.
+    Change ids are then allocated and committed one transaction at a time, so
+    an id never becomes visible below a version a client already synced.
+    """
+    pass
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending Payment'),
@@ -63,22 +87,32 @@ class Receipt(models.Model):
     ]
     
     receipt_id = models.CharField(max_length=100, unique=True, db_index=True)
-    created_at = models.DateTimeField(db_index=True, default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
     total_items = models.IntegerField()
-    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
-    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='SIMULATED', db_index=True)
+    total_amount = models.IntegerField(help_text="Total in cents")
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='SIMULATED')
 
     def __str__(self):
         return f"Receipt {self.receipt_id}"
 
+    class Meta:
+        # INCLUDE makes range aggregates index-only on Postgres; other backends build the plain index
+        indexes = [
+            models.Index(fields=['source', 'created_at'], include=['total_amount', 'total_items'], name='receipt_source_created'),
+            models.Index(fields=['created_at'], include=['source', 'total_amount', 'total_items'], name='receipt_created'),
+        ]
+
 class ReceiptItem(models.Model):
     receipt = models.ForeignKey(Receipt, related_name="items", on_delete=models.CASCADE)
     product = models.ForeignKey(Product, null=True, blank=True, on_delete=models.SET_NULL)
+    # Copies of receipt.created_at and product.category so item-level range scans need no joins
+    created_at = models.DateTimeField(default=timezone.now)
+    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.SET_NULL, db_index=False)
     product_name_snapshot = models.CharField(max_length=255)
     category_snapshot = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     qty = models.IntegerField()
-    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
-    line_total = models.DecimalField(max_digits=10, decimal_places=2)
+    unit_price = models.IntegerField(help_text="Price per unit in cents")
+    line_total = models.IntegerField(help_text="Line total in cents")
 
     def __str__(self):
         return f"{self.qty}x {self.product_name_snapshot} ({self.receipt.receipt_id})"
@@ -88,4 +122,77 @@ class ReceiptItem(models.Model):
             models.Index(fields=['receipt']),
             models.Index(fields=['product']),
             models.Index(fields=['category_snapshot']),
+            models.Index(fields=['created_at', 'product']),
+            models.Index(fields=['created_at', 'category']),
         ]
+
+class HourlySales(models.Model):
+    """
+    Hourly sales rollup maintained by store.rollups. Each hour is stored at
+    three grains so distinct order counts stay exact: one TOTAL row per source,
+    one CATEGORY row per category sold and one PRODUCT row per product sold.
+    """
+    LEVEL_CHOICES = [
+        ('TOTAL', 'Total'),
+        ('CATEGORY', 'Category'),
+        ('PRODUCT', 'Product'),
+    ]
+
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES)
+    hour = models.DateTimeField(help_text="Start of the hour bucket")
+    source = models.CharField(max_length=20, choices=Receipt.SOURCE_CHOICES)
+    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.SET_NULL, db_index=False)
+    product = models.ForeignKey(Product, null=True, blank=True, on_delete=models.SET_NULL, db_index=False)
+    category_name = models.CharField(max_length=255, blank=True, default='')
+    product_name = models.CharField(max_length=255, blank=True, default='')
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0, help_text="Revenue in cents")
+
+    class Meta:
+        verbose_name_plural = "Hourly sales"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['level', 'hour', 'source', 'category_name', 'product_name'],
+                name='hourly_sales_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['level', 'category', 'hour']),
+            models.Index(fields=['level', 'product', 'hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.level} {self.hour:%Y-%m-%d %H:00} {self.product_name or self.category_name}"
+
+class DailySales(models.Model):
+    """
+    Per-day receipt totals behind /analytics/kpi, one row per local day and
+    source. Kept in step with HourlySales by store.rollups.
+    """
+    day = models.DateField(help_text="Local date in TIME_ZONE")
+    source = models.CharField(max_length=20, choices=Receipt.SOURCE_CHOICES)
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0, help_text="Revenue in cents")
+
+    class Meta:
+        verbose_name_plural = "Daily sales"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'source'], name='daily_sales_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%Y-%m-%d} {self.source}"
+
+class RollupVersion(models.Model):
+    """
+    Counters bumped by store.rollups whenever HourlySales/DailySales change.
+    Kept in the database so every worker sees a bump, whichever process
+    (web, reconcile_payments, a management command) made it.
+    """
+    scope = models.CharField(max_length=10, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.scope} v{self.version}"
@@ -0,0 +1,169 @@
+from datetime import datetime, time as dt_time, timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Sum, Count, Max, Value, Q, F
+from django.db.models.functions import TruncDate, TruncHour, Coalesce
+from .models import Receipt, ReceiptItem, HourlySales, DailySales, RollupVersion
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']  # datetime.weekday() order
+
+# HourlySales column summed for each analytics metric
+ROLLUP_METRICS = {
+    'revenue': 'revenue',
+    'orders': 'orders',
+    'quantity': 'quantity',
+}
+
+# Hours rebuilt per transaction, keeps memory flat on year-long rebuilds
+REFRESH_WINDOW = timedelta(days=7)
+
+# Bumped whenever rollup rows change. LIVE covers ranges that include today,
+# HISTORY covers closed ranges and only moves when past hours are rewritten.
+# The counters live in RollupVersion; the cache only remembers them for
+# ROLLUP_VERSION_TTL seconds so a worker picks up another process's bump quickly.
+ROLLUP_VERSION_KEYS = {
+    'live': "analytics:version:live",
+    'history': "analytics:version:history",
+}
+ROLLUP_VERSION_TTL = 5
+
+def rollup_version(scope: str) -> str:
+    key = ROLLUP_VERSION_KEYS[scope]
+    version = cache.get(key)
+    if version is None:
+        row = RollupVersion.objects.filter(scope=scope).values_list('version', flat=True).first()
+        version = str(row or 0)
+        cache.set(key, version, ROLLUP_VERSION_TTL)
+    return version
+
+def _bump_rollup_versions(start):
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    scopes = ['live', 'history'] if start < today else ['live']
+    for scope in scopes:
+        if not RollupVersion.objects.filter(scope=scope).update(version=F('version') + 1):
+            RollupVersion.objects.get_or_create(scope=scope, defaults={'version': 1})
+        # This process sees its own bump at once, others within ROLLUP_VERSION_TTL
+        version = RollupVersion.objects.values_list('version', flat=True).get(scope=scope)
+        cache.set(ROLLUP_VERSION_KEYS[scope], str(version), ROLLUP_VERSION_TTL)
+
+def _floor_hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+def _window_rows(start, end):
+    receipts = Receipt.objects.filter(created_at__gte=start, created_at__lt=end)
+    items = ReceiptItem.objects.filter(created_at__gte=start, created_at__lt=end)
+
+    for row in (receipts.values(bucket=TruncHour('created_at'), src=Coalesce('source', Value('')))
+                        .annotate(n=Count('id'), qty=Sum('total_items'), rev=Sum('total_amount'))
+                        .order_by()):
+        yield HourlySales(
+            level='TOTAL', hour=row['bucket'], source=row['src'],
+            orders=row['n'], quantity=row['qty'] or 0, revenue=row['rev'] or 0
+        )
+
+    items = items.annotate(
+        bucket=TruncHour('created_at'),
+        src=Coalesce('receipt__source', Value('')),
+        cat_name=Coalesce('category_snapshot', Value('')),
+    )
+    for row in (items.values('bucket', 'src', 'cat_name')
+                     .annotate(n=Count('receipt', distinct=True), qty=Sum('qty'), rev=Sum('line_total'),
+                               cat_id=Max('category_id'))
+                     .order_by()):
+        yield HourlySales(
+            level='CATEGORY', hour=row['bucket'], source=row['src'],
+            category_id=row['cat_id'], category_name=row['cat_name'],
+            orders=row['n'], quantity=row['qty'] or 0, revenue=row['rev'] or 0
+        )
+
+    for row in (items.values('bucket', 'src', 'cat_name', 'product_name_snapshot')
+                     .annotate(n=Count('receipt', distinct=True), qty=Sum('qty'), rev=Sum('line_total'),
+                               cat_id=Max('category_id'), prod_id=Max('product_id'))
+                     .order_by()):
+        yield HourlySales(
+            level='PRODUCT', hour=row['bucket'], source=row['src'],
+            category_id=row['cat_id'], category_name=row['cat_name'],
+            product_id=row['prod_id'], product_name=row['product_name_snapshot'],
+            orders=row['n'], quantity=row['qty'] or 0, revenue=row['rev'] or 0
+        )
+
+def refresh_sales_rollup(start, end):
+    """
+    Rebuilds HourlySales for every hour from start's hour through end's hour
+    (inclusive) from the raw receipts, along with the DailySales rows of the
+    days it touches. Idempotent, so it is safe to call after any insert or
+    delete of receipts in that span.
+    """
+    cursor = _floor_hour(start)
+    stop = _floor_hour(end) + timedelta(hours=1)
+
+    while cursor < stop:
+        window_end = min(cursor + REFRESH_WINDOW, stop)
+        with transaction.atomic():
+            HourlySales.objects.filter(hour__gte=cursor, hour__lt=window_end).delete()
+            # Upsert so a concurrent refresh of the same hour cannot fail on the unique key
+            HourlySales.objects.bulk_create(
+                _window_rows(cursor, window_end),
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['level', 'hour', 'source', 'category_name', 'product_name'],
+                update_fields=['category', 'product', 'orders', 'quantity', 'revenue'],
+            )
+        cursor = window_end
+
+    # Also bumps the rollup versions once both tables are current
+    refresh_daily_sales(timezone.localdate(start), timezone.localdate(end))
+
+def refresh_daily_sales(first_day, last_day):
+    """
+    Rebuilds DailySales for every local day from first_day through last_day
+    (inclusive) from the raw receipts. Each day is one small grouped read of
+    the receipt_created index.
+    """
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(first_day, dt_time.min), tz)
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), dt_time.min), tz)
+
+    rows = (Receipt.objects.filter(created_at__gte=start, created_at__lt=end)
+                   .values(day=TruncDate('created_at'), src=Coalesce('source', Value('')))
+                   .annotate(n=Count('id'), qty=Sum('total_items'), rev=Sum('total_amount'))
+                   .order_by())
+
+    with transaction.atomic():
+        DailySales.objects.filter(day__gte=first_day, day__lte=last_day).delete()
+        DailySales.objects.bulk_create(
+            (DailySales(day=row['day'], source=row['src'], orders=row['n'],
+                        quantity=row['qty'] or 0, revenue=row['rev'] or 0) for row in rows),
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['day', 'source'],
+            update_fields=['orders', 'quantity', 'revenue'],
+        )
+
+    _bump_rollup_versions(start)
+
+def refresh_sales_rollup_on_commit(start, end=None):
+    """Schedules refresh_sales_rollup for after the surrounding transaction commits."""
+    transaction.on_commit(lambda: refresh_sales_rollup(start, end or start))
+
+def rollup_filter(category_id=None, product_id=None) -> Q:
+    """
+    Selects HourlySales rows at the grain that answers the filters exactly:
+    PRODUCT rows for a product, CATEGORY rows for a category, TOTAL otherwise.
+    """
+    if product_id:
+        q = Q(level='PRODUCT', product_id=product_id)
+        if category_id:
+            q &= Q(category_id=category_id)
+        return q
+    if category_id:
+        return Q(level='CATEGORY', category_id=category_id)
+    return Q(level='TOTAL')
+
+def rollup_queryset(start, end, category_id=None, product_id=None, source=None):
+    """HourlySales rows in [start, end) selected by rollup_filter, optionally for one source."""
+    qs = HourlySales.objects.filter(rollup_filter(category_id, product_id), hour__gte=start, hour__lt=end)
+    if source:
+        qs = qs.filter(source=source)
+    return qs
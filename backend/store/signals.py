@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Category, Product, CatalogChange, CatalogLock
+
+IMAGE_FIELDS = {
+    Category: ('icon', 'icon_variants'),
+    Product: ('image', 'image_variants'),
+}
+
+# Registered before record_catalog_change so the recorded change covers the new derivatives
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+def generate_image_derivatives(sender, instance, **kwargs):
+    from .images import build_image_derivatives
+
+    field_name, variants_name = IMAGE_FIELDS[sender]
+    image = getattr(instance, field_name)
+    current = getattr(instance, variants_name)
+
+    if not image:
+        variants = None
+    elif current and current.get('source') == image.name:
+        return  # Derivatives already match this upload
+    else:
+        try:
+            variants = build_image_derivatives(image)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Could not build image derivatives for {image.name}: {e}")
+            variants = None
+
+    if variants != current:
+        # update() so this does not re-trigger the save signals
+        sender.objects.filter(pk=instance.pk).update(**{variants_name: variants})
+        setattr(instance, variants_name, variants)
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+def record_catalog_change(sender, instance, **kwargs):
+    from .api import invalidate_catalog
+    with transaction.atomic():
+        # Held until the surrounding transaction commits, so ids commit in order
+        CatalogLock.objects.select_for_update().get_or_create(pk=1)
+        CatalogChange.objects.create(
+            kind='CATEGORY' if sender is Category else 'PRODUCT',
+            object_id=instance.pk
+        )
+    # After commit, so a request in between cannot re-cache the pre-edit menu
+    transaction.on_commit(invalidate_catalog)
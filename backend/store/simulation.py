@@ -0,0 +1,77 @@
+import math
+import numpy as np
+
+# Relative order volume per opening hour (07:00 - 18:00)
+INTRADAY_WEIGHTS = {
+    7: 0.5, 8: 1.0, 9: 0.8, 10: 0.7, 11: 0.6,
+    12: 1.2, 13: 0.9, 14: 0.8, 15: 1.0, 16: 0.8, 17: 0.6
+}
+SEASONAL_MULTIPLIERS = {
+    1: 1.0, 2: 1.0, 3: 1.1, 4: 1.2, 5: 1.15, 6: 0.9,
+    7: 0.85, 8: 0.85, 9: 0.8, 10: 0.9, 11: 1.0, 12: 1.05
+}
+WEEKDAY_MULTIPLIERS = [1.1, 0.9, 0.9, 1.0, 1.15, 1.0, 0.9]  # Mon=0 ... Sun=6
+
+# (values, probabilities) for products per basket and quantity per line
+BASKET_SIZES = ([1, 2, 3], [0.65, 0.28, 0.07])
+LINE_QUANTITIES = ([1, 2], [0.9, 0.1])
+
+# Logistic growth trend from ~65 to ~170 orders a day
+TREND_FLOOR = 65.0
+TREND_CEILING = 170.0
+TREND_RATE = 0.05
+
+HOURS = np.array(list(INTRADAY_WEIGHTS), dtype=np.int64)
+HOUR_PROBS = np.array(list(INTRADAY_WEIGHTS.values())) / sum(INTRADAY_WEIGHTS.values())
+
+def product_weight(category_name: str) -> float:
+    cat_name = category_name.lower()
+    if 'signature' in cat_name:
+        return 2.0
+    if 'sparking' in cat_name or 'smoothie' in cat_name:
+        return 1.5
+    if 'matcha' in cat_name:
+        return 1.2
+    if 'weird' in cat_name:
+        return 0.5
+    return 1.0
+
+def expected_orders(day, day_index: int, total_days: int) -> float:
+    trend = TREND_FLOOR + (TREND_CEILING - TREND_FLOOR) / (1.0 + math.exp(-TREND_RATE * (day_index - total_days / 2.0)))
+    return trend * WEEKDAY_MULTIPLIERS[day.weekday()] * SEASONAL_MULTIPLIERS[day.month]
+
+def simulate_day(rng: np.random.Generator, day, day_index: int, total_days: int, prices, product_probs) -> dict:
+    """
+    Draws one day of orders in a handful of vectorised calls. Receipts come
+    back sorted by time of day; line items are grouped by receipt in the same
+    order. Money is in integer cents, like the price array passed in.
+
+    Receipt columns: seconds (since midnight), suffix (24-bit receipt id tag),
+    total_items, total_amount. Line columns: receipt (index into the receipt
+    columns), product (index into prices), qty, unit_price, line_total.
+    """
+    # +/- 15% noise around the trend, weekday and seasonal model
+    orders = int(round(expected_orders(day, day_index, total_days) * rng.uniform(0.85, 1.15)))
+
+    seconds = rng.choice(HOURS, size=orders, p=HOUR_PROBS) * 3600 + rng.integers(0, 3600, size=orders)
+    seconds.sort()
+    suffix = rng.integers(0, 16 ** 6, size=orders)
+
+    sizes = rng.choice(BASKET_SIZES[0], size=orders, p=BASKET_SIZES[1])
+    receipt = np.repeat(np.arange(orders), sizes)
+    product = rng.choice(len(prices), size=receipt.size, p=product_probs)
+    qty = rng.choice(LINE_QUANTITIES[0], size=receipt.size, p=LINE_QUANTITIES[1])
+    unit_price = np.asarray(prices, dtype=np.int64)[product]
+    line_total = unit_price * qty
+
+    return {
+        'seconds': seconds,
+        'suffix': suffix,
+        'total_items': np.bincount(receipt, weights=qty, minlength=orders).astype(np.int64),
+        'total_amount': np.bincount(receipt, weights=line_total, minlength=orders).astype(np.int64),
+        'receipt': receipt,
+        'product': product,
+        'qty': qty,
+        'unit_price': unit_price,
+        'line_total': line_total,
+    }
@@ -1,3 +1,335 @@
-from django.test import TestCase
+import csv
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .engine import _snapshot, get_snapshot
+from .exports import HAS_PYARROW
+from .models import Category, Product, Receipt, ReceiptItem, DailySales, RollupVersion
+from .rollups import refresh_sales_rollup, rollup_version, ROLLUP_VERSION_KEYS
+from .simulation import simulate_day
+
+# Best-of-three wall time allowed for a 60 day /timeseries request
+TIMESERIES_BUDGET_MS = 250
+
+def rounded(data, places=6):
+    """Rounds every float in a JSON payload so summation order does not matter."""
+    if isinstance(data, float):
+        return round(data, places)
+    if isinstance(data, dict):
+        return {key: rounded(value, places) for key, value in data.items()}
+    if isinstance(data, list):
+        return [rounded(value, places) for value in data]
+    return data
+
+
+class TimeSeriesEndpointTests(TestCase):
+    start = '2025-03-01'
+    end = '2025-04-29'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.signature = Category.objects.create(name='Signature', sort_order=1)
+        cls.tea = Category.objects.create(name='Tea', sort_order=2)
+        cls.latte = Product.objects.create(category=cls.signature, name='Rabbit Latte', price=450)
+        Product.objects.create(category=cls.signature, name='Carrot Cream', price=500)
+        Product.objects.create(category=cls.tea, name='Jasmine Tea', price=300)
+
+        # simulate_sales also refreshes the hourly rollup the endpoint reads
+        with tempfile.TemporaryDirectory() as outdir:
+            call_command('simulate_sales', start=cls.start, end=cls.end, outdir=outdir, stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+        # Version lookups are memoised for a few seconds; warm them so query counts cover the endpoint
+        rollup_version('live')
+        rollup_version('history')
+        # Each test rolls back, and SQLite then reuses receipt ids the snapshot already holds
+        _snapshot._reset(None)
+
+    def get_timeseries(self, **params):
+        params = {'start': self.start, 'end': self.end, **params}
+        response = self.client.get('/api/analytics/timeseries', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_single_query_for_every_filter(self):
+        for params in (
+            {},
+            {'metric': 'orders', 'freq': 'H'},
+            {'metric': 'quantity', 'freq': 'W', 'category_id': self.signature.id},
+            {'metric': 'orders', 'product_id': self.latte.id},
+        ):
+            with self.subTest(**params), self.assertNumQueries(1):
+                self.get_timeseries(**params)
+
+    def test_totals_match_receipts(self):
+        revenue = self.get_timeseries(metric='revenue')
+        orders = self.get_timeseries(metric='orders')
+
+        self.assertEqual(revenue['summary']['total'], Receipt.objects.aggregate(t=Sum('total_amount'))['t'])
+        self.assertEqual(orders['summary']['total'], Receipt.objects.count())
+
+        expected = {
+            row['category_snapshot']: row['t']
+            for row in ReceiptItem.objects.values('category_snapshot').annotate(t=Sum('line_total'))
+        }
+        self.assertEqual(revenue['breakdown']['category_tot'], expected)
+
+    def test_product_orders_count_distinct_receipts(self):
+        data = self.get_timeseries(metric='orders', product_id=self.latte.id)
+        expected = ReceiptItem.objects.filter(product=self.latte).values('receipt').distinct().count()
+        self.assertEqual(data['summary']['total'], expected)
+
+    def test_latency_budget(self):
+        timings = []
+        for _ in range(3):
+            cache.clear()  # Time the computation, not a cache hit
+            started = time.perf_counter()
+            self.get_timeseries(freq='H')
+            timings.append((time.perf_counter() - started) * 1000)
+        self.assertLess(min(timings), TIMESERIES_BUDGET_MS)
+
+    def test_repeat_request_served_from_cache(self):
+        with self.assertNumQueries(1):
+            first = self.get_timeseries(metric='orders')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_timeseries(metric='orders'), first)
+
+    def test_receipt_insert_only_invalidates_ranges_including_today(self):
+        today = timezone.localdate().strftime('%Y-%m-%d')
+        self.get_timeseries()
+        self.assertEqual(self.get_timeseries(start=today, end=today)['summary']['total'], 0)
+
+        Receipt.objects.create(receipt_id='TEST-1', total_items=1, total_amount=450, source='REAL')
+        refresh_sales_rollup(timezone.now(), timezone.now())
+
+        with self.assertNumQueries(0):
+            self.get_timeseries()
+        self.assertEqual(self.get_timeseries(start=today, end=today)['summary']['total'], 450)
+
+    def test_bump_from_another_process_retires_closed_ranges(self):
+        first = self.get_timeseries(metric='orders')
+
+        # Another worker back-fills history: only the database row moves, and
+        # this process's memoised version lapses after ROLLUP_VERSION_TTL
+        RollupVersion.objects.update_or_create(scope='history', defaults={'version': 99})
+        cache.delete(ROLLUP_VERSION_KEYS['history'])
+
+        with self.assertNumQueries(2):  # Version lookup, then the recomputation
+            self.assertEqual(self.get_timeseries(metric='orders'), first)
+
+    def test_columnar_engine_matches_rollup(self):
+        for path, params in (
+            ('/api/analytics/kpi', {}),
+            ('/api/analytics/daily', {}),
+            ('/api/analytics/hourly', {'source': 'SIMULATED'}),
+            ('/api/analytics/top-products', {'limit': 2}),
+            ('/api/analytics/timeseries', {'metric': 'orders', 'freq': 'H'}),
+            ('/api/analytics/timeseries', {'metric': 'quantity', 'freq': 'W', 'category_id': self.signature.id}),
+            ('/api/analytics/timeseries', {'metric': 'orders', 'product_id': self.latte.id}),
+        ):
+            params = {'start': self.start, 'end': self.end, **params}
+            with self.subTest(path=path, **params):
+                cache.clear()
+                expected = rounded(self.client.get(path, params).json())
+                cache.clear()
+                with override_settings(ANALYTICS_ENGINE='columnar'):
+                    self.assertEqual(rounded(self.client.get(path, params).json()), expected)
+
+    @override_settings(ANALYTICS_ENGINE='columnar')
+    def test_columnar_engine_appends_new_receipts(self):
+        today = timezone.localdate().strftime('%Y-%m-%d')
+        self.assertEqual(self.get_timeseries(start=today, end=today)['summary']['total'], 0)
+
+        Receipt.objects.create(receipt_id='TEST-1', total_items=1, total_amount=450, source='REAL')
+        refresh_sales_rollup(timezone.now(), timezone.now())
+
+        # High-water mark check, then only receipts above it and their lines
+        with self.assertNumQueries(3):
+            data = self.get_timeseries(start=today, end=today)
+        self.assertEqual(data['summary']['total'], 450)
+
+        # Nothing new: the check alone
+        cache.clear()
+        rollup_version('live'), rollup_version('history')
+        with self.assertNumQueries(1):
+            get_snapshot()
+
+    def test_columnar_refresh_publishes_a_new_generation(self):
+        columns = get_snapshot()
+        size = columns.r_ts.size
+
+        Receipt.objects.create(receipt_id='TEST-1', total_items=1, total_amount=450, source='REAL')
+        refreshed = get_snapshot()
+
+        # A reader still holding the old generation sees consistent columns
+        self.assertIsNot(refreshed, columns)
+        self.assertEqual((columns.r_ts.size, columns.r_cents.size), (size, size))
+        self.assertEqual((refreshed.r_ts.size, refreshed.r_cents.size), (size + 1, size + 1))
+
+
+class KPIEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def add_receipt(self, receipt_id, created_at, total_amount, source='REAL'):
+        Receipt.objects.create(
+            receipt_id=receipt_id, created_at=created_at, total_items=2, total_amount=total_amount, source=source
+        )
+        refresh_sales_rollup(created_at, created_at)
+
+    def get_kpi(self, **params):
+        response = self.client.get('/api/analytics/kpi', {'start': '2025-06-01', 'end': '2025-06-02', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_receipt_insert_upserts_its_day(self):
+        morning = timezone.make_aware(datetime(2025, 6, 1, 9, 30))
+        self.add_receipt('KPI-1', morning, 450)
+        self.add_receipt('KPI-2', morning.replace(hour=15), 550)
+        self.add_receipt('KPI-3', morning + timedelta(days=1), 300, source='SIMULATED')
+
+        self.assertEqual(
+            list(DailySales.objects.order_by('day').values_list('day', 'source', 'orders', 'quantity', 'revenue')),
+            [(morning.date(), 'REAL', 2, 4, 1000), (morning.date() + timedelta(days=1), 'SIMULATED', 1, 2, 300)],
+        )
+
+    def test_kpi_sums_daily_rows(self):
+        morning = timezone.make_aware(datetime(2025, 6, 1, 9, 30))
+        self.add_receipt('KPI-1', morning, 450)
+        self.add_receipt('KPI-2', morning + timedelta(days=1), 550, source='SIMULATED')
+
+        with self.assertNumQueries(1):
+            data = self.get_kpi()
+        self.assertEqual(data['total_orders'], 2)
+        self.assertEqual(data['total_revenue'], 1000)
+        self.assertEqual(data['avg_order_value'], 500)
+        self.assertEqual(self.get_kpi(source='SIMULATED')['total_revenue'], 550)
+
+    def test_rebuild_command(self):
+        morning = timezone.make_aware(datetime(2025, 6, 1, 9, 30))
+        self.add_receipt('KPI-1', morning, 450)
+        DailySales.objects.all().delete()
+
+        call_command('rebuild_daily_sales', stdout=StringIO())
+        self.assertEqual(self.get_kpi()['total_revenue'], 450)
+
+
+class CatalogEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tea = Category.objects.create(name='Tea')
+        self.jasmine = Product.objects.create(category=self.tea, name='Jasmine Tea', price=300)
+
+    def test_edit_reaches_workers_that_missed_the_invalidation(self):
+        first = self.client.get('/api/store/catalog')
+        etag = first['ETag']
+
+        # TestCase never commits, so on_commit invalidation does not run: like a
+        # worker other than the one that saved, this process still holds the old body
+        self.jasmine.price = 350
+        self.jasmine.save()
+
+        response = self.client.get('/api/store/catalog', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['products'][0]['price'], 350)
+
+    def test_changes_at_current_version_are_empty(self):
+        version = self.client.get('/api/store/catalog').json()['version']
+
+        data = self.client.get('/api/store/catalog/changes', {'since': version}).json()
+        self.assertEqual(data['version'], version)
+        self.assertEqual((data['categories'], data['products']), ([], []))
+
+        self.jasmine.price = 350
+        self.jasmine.save()
+        data = self.client.get('/api/store/catalog/changes', {'since': version}).json()
+        self.assertEqual(data['categories'], [])
+        self.assertEqual([(p['id'], p['price']) for p in data['products']], [(self.jasmine.id, 350)])
+
+    def test_change_ids_are_allocated_under_the_catalog_lock(self):
+        with CaptureQueriesContext(connection) as ctx:
+            Product.objects.create(category=self.tea, name='Oolong', price=320)
+        tables = [q['sql'] for q in ctx.captured_queries if 'store_catalog' in q['sql']]
+        self.assertIn('store_cataloglock', tables[0])
+        self.assertTrue(tables[1].startswith('INSERT INTO "store_catalogchange"'))
+
+    def test_unchanged_catalog_revalidates(self):
+        etag = self.client.get('/api/store/catalog')['ETag']
+        self.assertEqual(self.client.get('/api/store/catalog', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class ExportEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tea')
+        product = Product.objects.create(category=category, name='Jasmine Tea', price=300)
+        created_at = timezone.make_aware(datetime(2025, 6, 1, 9, 30))
+        for i, source in enumerate(['REAL', 'SIMULATED', 'SIMULATED']):
+            receipt = Receipt.objects.create(
+                receipt_id=f'EXP-{i}', created_at=created_at, total_items=2, total_amount=600, source=source
+            )
+            ReceiptItem.objects.create(
+                receipt=receipt, product=product, created_at=created_at, category=category,
+                product_name_snapshot=product.name, category_snapshot=category.name,
+                qty=2, unit_price=300, line_total=600
+            )
+
+    def export(self, **params):
+        response = self.client.get('/api/analytics/export', {'start': '2025-06-01', 'end': '2025-06-01', **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_items(self):
+        rows = list(csv.DictReader(StringIO(self.export(source='SIMULATED').decode())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['product_name'], 'Jasmine Tea')
+        self.assertEqual(rows[0]['line_total'], '600')
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow not installed")
+    def test_parquet_receipts(self):
+        import pyarrow.parquet as pq
+        table = pq.read_table(BytesIO(self.export(table='receipts', format='parquet')))
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(sorted(table.column('source').to_pylist()), ['REAL', 'SIMULATED', 'SIMULATED'])
+
+    def test_rejects_unknown_format(self):
+        response = self.client.get('/api/analytics/export', {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SimulationTests(unittest.TestCase):
+    day = datetime(2025, 3, 7)
+    prices = [450, 500, 300]
+    product_probs = [0.5, 0.3, 0.2]
+
+    def simulate(self, seed):
+        return simulate_day(np.random.default_rng(seed), self.day, 10, 60, self.prices, self.product_probs)
+
+    def test_same_seed_same_day(self):
+        first, second = self.simulate(7), self.simulate(7)
+        for column in first:
+            np.testing.assert_array_equal(first[column], second[column])
+        self.assertFalse(np.array_equal(first['seconds'], self.simulate(8)['seconds']))
+
+    def test_receipt_totals_add_up_their_lines(self):
+        day = self.simulate(7)
+        self.assertTrue(np.all(np.diff(day['seconds']) >= 0))
+        self.assertTrue(np.all((day['seconds'] >= 7 * 3600) & (day['seconds'] < 18 * 3600)))
+        self.assertEqual(day['total_amount'].sum(), (np.take(self.prices, day['product']) * day['qty']).sum())
+        self.assertEqual(day['total_items'].sum(), day['qty'].sum())
 
-# Create your tests here.
@@ -22,6 +22,7 @@ export default function AnalyticsDashboard() {
     const [freq, setFreq] = useState('D'); // 'H' | 'D' | 'W'
     const [categoryId, setCategoryId] = useState('');
     const [productId, setProductId] = useState('');
+    const [source, setSource] = useState(''); // '' (all) | 'REAL' | 'SIMULATED'
     const [isComparing, setIsComparing] = useState(false);
     const [activeTab, setActiveTab] = useState('historical'); // 'historical' | 'forecast'
 
@@ -80,6 +81,7 @@ export default function AnalyticsDashboard() {
             let filterString = `?metric=${metric}&freq=${freq}&start=${startDate}&end=${endDate}`;
             if (categoryId) filterString += `&category_id=${categoryId}`;
             if (productId) filterString += `&product_id=${productId}`;
+            if (source) filterString += `&source=${source}`;
 
             // Fetch Current Period TimeSeries
             const currRes = await fetch(`${API_BASE}/analytics/timeseries${filterString}`);
@@ -87,6 +89,7 @@ export default function AnalyticsDashboard() {
 
             // Fetch Top Products
             let topStr = `?start=${startDate}&end=${endDate}`;
+            if (source) topStr += `&source=${source}`;
             const topRes = await fetch(`${API_BASE}/analytics/top-products${topStr}`);
             if (topRes.ok) setTopProducts(await topRes.json());
 
@@ -95,6 +98,7 @@ export default function AnalyticsDashboard() {
                 let pFilter = `?metric=${metric}&freq=${freq}&start=${prevDateRange.start}&end=${prevDateRange.end}`;
                 if (categoryId) pFilter += `&category_id=${categoryId}`;
                 if (productId) pFilter += `&product_id=${productId}`;
+                if (source) pFilter += `&source=${source}`;
                 const pRes = await fetch(`${API_BASE}/analytics/timeseries${pFilter}`);
                 if (pRes.ok) setPrevData(await pRes.json());
             } else {
@@ -112,7 +116,7 @@ export default function AnalyticsDashboard() {
         if (isAuthenticated) {
             fetchAnalytics();
         }
-    }, [isAuthenticated, metric, freq, startDate, endDate, categoryId, productId, isComparing]);
+    }, [isAuthenticated, metric, freq, startDate, endDate, categoryId, productId, source, isComparing]);
 
     // --- Run Forecast ---
     const runForecast = async () => {
@@ -128,7 +132,8 @@ export default function AnalyticsDashboard() {
                 train_end: endDate,
                 filters: {
                     ...(categoryId ? { category_id: parseInt(categoryId) } : {}),
-                    ...(productId ? { product_id: parseInt(productId) } : {})
+                    ...(productId ? { product_id: parseInt(productId) } : {}),
+                    ...(source ? { source } : {})
                 },
                 cv: { type: "rolling", splits: 3, step: 7 }
             };
@@ -300,6 +305,11 @@ export default function AnalyticsDashboard() {
                             <option value="">All Products</option>
                             {products.filter(p => !categoryId || p.category_id === parseInt(categoryId)).map(p => <option key={p.id} value={p.id}>{p.name}</option>)}
                         </select>
+                        <select className="bg-gray-50 border border-border text-sm font-medium rounded-xl p-2.5 outline-none" value={source} onChange={(e) => setSource(e.target.value)}>
+                            <option value="">All Sources</option>
+                            <option value="REAL">Real Sales</option>
+                            <option value="SIMULATED">Simulated</option>
+                        </select>
                     </div>
 
                     {/* Compare Toggle */}
@@ -1,7 +1,7 @@
 "use client";
 
 import { useCartStore } from "@/lib/store";
-import { formatCurrency, API_BASE } from "@/lib/utils";
+import { formatCurrency, API_BASE, getFullImageUrl } from "@/lib/utils";
 import { useState, useEffect, useRef } from "react";
 import { useRouter } from "next/navigation";
 import Image from "next/image";
@@ -27,7 +27,21 @@ export default function CheckoutPage() {
         }
     }, [items, router, state]);
 
-    // Polling Logic removed for manual confirmation
+    // Payment status push (SSE) instead of polling /status
+    useEffect(() => {
+        if (state !== 'AWAITING_PAYMENT' || !orderId) return;
+
+        const source = new EventSource(`${API_BASE}/payments/orders/${orderId}/events`);
+        source.addEventListener('status', (e) => {
+            const data = JSON.parse((e as MessageEvent).data);
+            if (data.status === 'PAID') {
+                source.close();
+                setState('SUCCESS');
+                clearCart();
+            }
+        });
+        return () => source.close();
+    }, [state, orderId, clearCart]);
 
     // Cleanup to attract screen after success
     useEffect(() => {
@@ -178,7 +192,7 @@ export default function CheckoutPage() {
                             */}
                                     {qrData.qrImage ? (
                                         <img
-                                            src={qrData.qrImage}
+                                            src={getFullImageUrl(qrData.qrImage)}
                                             alt="KHQR"
                                             className="w-full h-auto max-w-[300px] object-contain rounded-xl"
                                         />
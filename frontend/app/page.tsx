@@ -23,13 +23,9 @@ export default function Home() {
   useEffect(() => {
     async function fetchData() {
       try {
-        const [catsRes, prodsRes] = await Promise.all([
-          fetch(`${API_BASE}/store/categories`),
-          fetch(`${API_BASE}/store/products`)
-        ]);
-
-        const cats = await catsRes.json();
-        const prods = await prodsRes.json();
+        // One cached, ETag-validated response for the whole menu
+        const res = await fetch(`${API_BASE}/store/catalog`);
+        const { categories: cats, products: prods } = await res.json();
 
         setCategories(cats);
         setProducts(prods);
@@ -2,11 +2,14 @@
 
 import { Product } from "@/types";
 import { useCartStore } from "@/lib/store";
-import { formatCurrency, getFullImageUrl } from "@/lib/utils";
+import { formatCurrency, getFullImageUrl, getFullSrcSet } from "@/lib/utils";
 import { motion } from "framer-motion";
 import { Plus } from "lucide-react";
 import Image from "next/image";
 
+// Cards are laid out 2-4 per row on the kiosk grid
+const CARD_IMAGE_SIZES = "(min-width: 1024px) 25vw, (min-width: 768px) 33vw, 50vw";
+
 interface ProductCardProps {
     product: Product;
 }
@@ -23,11 +26,24 @@ export default function ProductCard({ product }: ProductCardProps) {
         >
             <div className="relative aspect-square w-full bg-muted">
                 {product.image_url ? (
-                    <img
-                        src={getFullImageUrl(product.image_url)}
-                        alt={product.name}
-                        className="w-full h-full object-cover"
-                    />
+                    <picture className="block w-full h-full">
+                        {product.image_srcset_avif && (
+                            <source
+                                type="image/avif"
+                                srcSet={getFullSrcSet(product.image_srcset_avif)}
+                                sizes={CARD_IMAGE_SIZES}
+                            />
+                        )}
+                        <img
+                            src={getFullImageUrl(product.image_url)}
+                            srcSet={getFullSrcSet(product.image_srcset)}
+                            sizes={CARD_IMAGE_SIZES}
+                            alt={product.name}
+                            loading="lazy"
+                            decoding="async"
+                            className="w-full h-full object-cover"
+                        />
+                    </picture>
                 ) : (
                     <div className="w-full h-full flex items-center justify-center text-muted-foreground">
                         No Image
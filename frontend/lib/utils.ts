@@ -47,3 +47,14 @@ export function getFullImageUrl(path: string | null | undefined): string {
     const base = API_BASE.replace('/api', '');
     return `${base}${path}`;
 }
+
+export function getFullSrcSet(srcset: string | null | undefined): string | undefined {
+    if (!srcset) return undefined;
+    return srcset
+        .split(',')
+        .map((candidate) => {
+            const [url, width] = candidate.trim().split(' ');
+            return `${getFullImageUrl(url)} ${width}`;
+        })
+        .join(', ');
+}
@@ -2,6 +2,8 @@ export interface Category {
     id: number;
     name: string;
     icon_url?: string | null;
+    icon_srcset?: string | null;
+    icon_srcset_avif?: string | null;
 }
 
 export interface Product {
@@ -11,6 +13,8 @@ export interface Product {
     price: number;
     description?: string;
     image_url?: string | null;
+    image_srcset?: string | null;
+    image_srcset_avif?: string | null;
 }
 
 export interface CartItem {